@@ -1,9 +1,12 @@
 import sys
+import math
+import logging
 from packet import *
 from timeout_calculator  import *
-import matplotlib.pyplot as plt1000
-window_size = []
-tick_number = []
+from unacked_table import *
+from receive_window import *
+from congestion_control import *
+log = logging.getLogger("sim.host")
 
 class UnackedPacket:
   """
@@ -27,74 +30,136 @@ class UnackedPacket:
     return str(self.seq_num)
 
 class AimdHost:
+  """
+  Window-based sender whose window is set by a congestion controller (see
+  congestion_control.py), AimdControl unless another one is given. Besides
+  retransmitting packets whose timers fire, it counts duplicate ACKs, i.e., ACKs
+  that don't move in_order_rx_seq, and retransmits the first missing packet right
+  away when the controller asks for a fast retransmit. With a pacer (see
+  pacing.py), new packets are spread over the RTT instead of filling the window at once.
+  """
 
-  def __init__(self):
-    self.unacked = []           # list of unacked packets
-    self.window = 1             # We'll initialize window to 1
+  def __init__(self, cc=None, pacer=None):
+    self.cc = cc if cc is not None else AimdControl() # congestion controller, owns the window
+    self.pacer = pacer          # optional pacing.Pacer that spaces out new packets
+    self.unacked = UnackedTable() # unacked packets, indexed by seq_num and by timeout_tick
     self.max_seq = -1           # maximum sequence number sent so far
     self.in_order_rx_seq = -1   # maximum sequence number received so far in order
-    self.slow_start = True      # Are we in slow start?
-    self.next_decrease = -1     # When to next decrease your window; adds some hystersis
+    self.rx_window = ReceiveWindow() # which sequence numbers the receiver has seen
+    self.dup_acks = 0           # ACKs in a row that didn't advance in_order_rx_seq
+    self.fast_retx = []         # sequence numbers to retransmit on the next send()
     self.timeout_calculator = TimeoutCalculator() # object for computing timeouts
 
+  @property
+  def window(self):             # current window in packets, set by the congestion controller
+    return self.cc.window
+
   def send(self, tick):
-    print ("@ tick " + str(tick) + " window is " + str(self.window))
-    tick_number.append(tick)
-    window_size.append(self.window)
+    log.debug("@ tick %d window is %s", tick, self.window)
 
     # Create an empty list of packets that the host will send
     packets = []
+    retransmitted = set()        # sequence numbers retransmitted on this tick
     # First, process retransmissions
-    for i in range(0, len(self.unacked)):
-      unacked_pkt = self.unacked[i]
-      if (tick >= unacked_pkt.timeout_tick):
-        # Retransmit any packet that has timed out by doing the following in order
-        # (1) creating a new packet,
-        packet = Packet(tick, unacked_pkt.seq_num)
-        # (2) setting its retx attribute to True (just for debugging)
-        packet.retx = True
-        # (3) Append the packet to the list of packets created earlier
-        packets.append(packet)
-        # (4) Backing off the timer
-        self.timeout_calculator.exp_backoff()
-        # (5) Updating timeout_tick and timeout_duration appropriately after backing off the timer
-        unacked_pkt.timeout_duration = self.timeout_calculator.timeout
-        unacked_pkt.timeout_tick = tick + unacked_pkt.timeout_duration
-        # (6) Updating num_retx
-        unacked_pkt.num_retx += 1
-
-        # Multiplicative decrease, if it's time for the next decrease
-        # Cut window by half, but don't let it go below 1
-        half = self.window / 2
-        if half < 1:
-          self.window = 1
-        elif (half >= 1 and self.next_decrease <= tick):
-          self.window = half
-
-        # Make sure the next multiplicative decrease doesn't happen until an RTT later
-        self.next_decrease = tick + self.timeout_calculator.mean_rtt
-
-        # Exit slow start, whether you were in it or not
-        self.slow_start = False
-
-      self.unacked[i] = unacked_pkt
+    for unacked_pkt in self.unacked.expired(tick):
+      # Retransmit any packet that has timed out by doing the following in order
+      # (1) creating a new packet,
+      packet = packet_pool.alloc(tick, unacked_pkt.seq_num)
+      # (2) setting its retx attribute to True (just for debugging)
+      packet.retx = True
+      # (3) Append the packet to the list of packets created earlier
+      packets.append(packet)
+      retransmitted.add(unacked_pkt.seq_num)
+      # (4) Backing off the timer
+      self.timeout_calculator.exp_backoff()
+      # (5) Updating timeout_tick and timeout_duration appropriately after backing off the timer
+      unacked_pkt.timeout_duration = self.timeout_calculator.timeout
+      unacked_pkt.timeout_tick = tick + unacked_pkt.timeout_duration
+      self.unacked.rearm(unacked_pkt)
+      # (6) Updating num_retx
+      unacked_pkt.num_retx += 1
+
+      # Let the congestion controller react to the loss
+      self.cc.on_timeout(self, tick, unacked_pkt.seq_num)
+
+    # Then fast retransmissions, which restart the packet's timer without backing it off
+    for seq_num in self.fast_retx:
+      unacked_pkt = self.unacked.get(seq_num)
+      if (unacked_pkt is None or seq_num in retransmitted):
+        continue                 # acked or timed out in the meantime
+      packet = packet_pool.alloc(tick, seq_num)
+      packet.retx = True
+      packets.append(packet)
+      retransmitted.add(seq_num)
+      unacked_pkt.timeout_duration = self.timeout_calculator.timeout
+      unacked_pkt.timeout_tick = tick + unacked_pkt.timeout_duration
+      self.unacked.rearm(unacked_pkt)
+      unacked_pkt.num_retx += 1
+      log.debug("fast retransmit @ %d of sequence number %d", tick, seq_num)
+    self.fast_retx = []
 
     # Now fill up the window with new packets
-    while (len(self.unacked) < self.window):
+    while (len(self.unacked) < self.window and (self.pacer is None or self.pacer.can_send(tick))):
       # Create new packets, set their retransmission timeout, and add them to the list
-      packet = Packet(tick, self.max_seq+1)
+      packet = packet_pool.alloc(tick, self.max_seq+1)
       unacked_packet = UnackedPacket(packet.seq_num)
       unacked_packet.timeout_duration = self.timeout_calculator.timeout
       unacked_packet.timeout_tick = self.timeout_calculator.timeout + tick
       packets.append(packet)
       # Remember to update self.max_seq and add then just sent packet to self.unacked
       self.max_seq += 1
-      self.unacked.append(unacked_packet)
-      print("send packet @", tick, "with sequence number ", self.max_seq)
+      self.unacked.add(unacked_packet)
+      log.debug("send packet @ %d with sequence number %d", tick, self.max_seq)
+      if (self.pacer is not None):
+        self.pacer.on_send(tick, self)
 
     # Return the list of packets that need to be sent on to the network
     return packets
 
+  def next_send_tick(self, tick):
+    """
+    Earliest tick >= tick at which send() has something to do: right away if there
+    are fast retransmissions to send or the window has room for new packets,
+    otherwise when the first unacked packet times out. With pacing, new packets
+    wait for the pacer, and a timeout can come first.
+    """
+    if (len(self.fast_retx) > 0):
+      return tick
+    candidates = []
+    if (len(self.unacked) < self.window):
+      if (self.pacer is None):
+        return tick
+      candidates.append(self.pacer.next_send_tick(tick))
+    next_timeout_tick = self.unacked.next_timeout_tick()
+    if (next_timeout_tick is not None):
+      candidates.append(math.ceil(next_timeout_tick))
+    if (len(candidates) == 0):
+      return None
+    return max(tick, min(candidates))
+
+  def state_signature(self, tick, base):
+    """
+    Hashable summary of everything that determines what this host does from tick
+    on, with ticks relative to tick and sequence numbers relative to base
+    """
+    return (self.cc.state_signature(tick, base), self.rx_window.state_signature(base), self.dup_acks,
+            tuple(seq_num - base for seq_num in self.fast_retx), self.max_seq - base, self.in_order_rx_seq - base,
+            self.timeout_calculator.state_signature(), self.unacked.state_signature(tick, base),
+            self.pacer.state_signature(tick) if self.pacer is not None else None)
+
+  def shift(self, ticks, seqs):
+    """
+    Move the host's state ticks into the future and seqs sequence numbers up
+    """
+    self.cc.shift(ticks, seqs)
+    if (self.pacer is not None):
+      self.pacer.shift(ticks)
+    self.max_seq         += seqs
+    self.in_order_rx_seq += seqs
+    self.fast_retx = [seq_num + seqs for seq_num in self.fast_retx]
+    self.rx_window.shift(seqs)
+    self.unacked.shift(ticks, seqs)
+
   def recv(self, pkt, tick):
     assert(tick > pkt.sent_ts)
     # Compute RTT sample
@@ -103,17 +168,21 @@ class AimdHost:
     self.timeout_calculator.update_timeout(RTT)
 
     # Remove received packet from self.unacked
-    for p in self.unacked:
-      if p.seq_num == pkt.seq_num:
-        self.unacked.remove(p)
-
-    # Update in_order_rx_seq to reflect the largest sequence number that you have received in order so far
-    self.in_order_rx_seq += 1
-
-    # Increase your window given that you just received an ACK. Remember that:
-    # 1. The window increase rule is different for slow start and congestion avoidance.
-    # 2. The recv() function is called on every ACK (not every RTT), so you should adjust your window accordingly.
-    if (self.slow_start):
-      self.window += 1
+    self.unacked.remove(pkt.seq_num)
+
+    # Update in_order_rx_seq to reflect the largest sequence number that you have received in order so far,
+    # which only moves past a lost or reordered packet once that packet arrives
+    self.rx_window.mark(pkt.seq_num)
+    advanced = self.rx_window.in_order_rx_seq() - self.in_order_rx_seq
+    self.in_order_rx_seq = self.rx_window.in_order_rx_seq()
+
+    # Tell the congestion controller about the ACK; an ACK that doesn't advance
+    # in_order_rx_seq is a duplicate ACK, which hints at a lost packet
+    if (advanced > 0):
+      self.dup_acks = 0
+      retransmit = self.cc.on_ack(self, tick, advanced)
     else:
-      self.window += 1/self.window
+      self.dup_acks += 1
+      retransmit = self.cc.on_dup_ack(self, tick, self.dup_acks)
+    if (retransmit and self.in_order_rx_seq + 1 in self.unacked and self.in_order_rx_seq + 1 not in self.fast_retx):
+      self.fast_retx.append(self.in_order_rx_seq + 1)
@@ -0,0 +1,178 @@
+"""
+Benchmarks for the transport simulator's hot loop.
+
+Each scenario below runs one host type over a fixed set of parameters and is timed
+over --repeat runs, keeping the fastest one, which is the least disturbed by
+whatever else the machine is doing. For each scenario this reports:
+
+  ticks/sec    simulated ticks per second of wall-clock time
+  packets/sec  packets sent by the host (original and retransmitted) per second
+  peak memory  peak memory allocated during the run, measured with tracemalloc
+
+tracemalloc slows Python down a lot, so memory is measured in a separate run
+that is not timed.
+
+--save FILE writes the results to a JSON baseline. --compare FILE reruns the
+scenarios and flags each one whose ticks/sec dropped, or whose peak memory grew,
+by more than --tolerance relative to the baseline. The exit status is 1 if any
+scenario regressed, so that this can be used as a check before and after
+changes to network.py or the host classes.
+
+python3 benchmark.py --save baseline.json
+python3 benchmark.py --compare baseline.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from network import *
+from engine import *
+from stop_and_wait_host  import *
+from sliding_window_host import *
+from aimd_host import *
+
+# name -> simulator arguments. The congestion collapse and AIMD scenarios are the
+# ones from the README.
+SCENARIOS = {
+  "stop_and_wait":          {"host_type": "StopAndWait",   "window_size": None, "rtt_min": 10,  "loss_ratio": 0.0,  "queue_limit": 1000000, "ticks": 200000},
+  "sliding_window_small":   {"host_type": "SlidingWindow", "window_size": 5,    "rtt_min": 10,  "loss_ratio": 0.01, "queue_limit": 1000000, "ticks": 200000},
+  "sliding_window_large":   {"host_type": "SlidingWindow", "window_size": 500,  "rtt_min": 100, "loss_ratio": 0.01, "queue_limit": 1000,    "ticks": 100000},
+  "aimd":                   {"host_type": "Aimd",          "window_size": None, "rtt_min": 10,  "loss_ratio": 0.0,  "queue_limit": 5,       "ticks": 200000},
+  "aimd_lossy":             {"host_type": "Aimd",          "window_size": None, "rtt_min": 50,  "loss_ratio": 0.01, "queue_limit": 100,     "ticks": 200000},
+  "congestion_collapse":    {"host_type": "SlidingWindow", "window_size": 10,   "rtt_min": 10,  "loss_ratio": 0.0,  "queue_limit": 1000000, "ticks": 100000},
+}
+
+def build_simulation(scenario, seed):
+  random.seed(seed)
+  if (scenario["host_type"] == "StopAndWait"):
+    host = StopAndWaitHost()
+  elif (scenario["host_type"] == "SlidingWindow"):
+    host = SlidingWindowHost(scenario["window_size"])
+  elif (scenario["host_type"] == "Aimd"):
+    host = AimdHost()
+  else:
+    raise ValueError("Invalid host_type " + str(scenario["host_type"]))
+  link  = Link(loss_ratio = scenario["loss_ratio"], queue_limit = scenario["queue_limit"])
+  pdbox = PropDelayBox(scenario["rtt_min"] - 1)
+  return Simulation(host, link, pdbox)
+
+def run_once(scenario, ticks, seed, engine):
+  """
+  Run scenario for ticks and return (seconds taken, packets sent, final in-order seq)
+  """
+  sim = build_simulation(scenario, seed)
+  start = time.perf_counter()
+  if (engine == "event"):
+    sim.run_events(ticks)
+  else:
+    sim.run(ticks)
+  elapsed = time.perf_counter() - start
+  return (elapsed, sim.num_original + sim.num_retransmitted, sim.host.in_order_rx_seq)
+
+def peak_memory(scenario, ticks, seed, engine):
+  """
+  Peak bytes allocated while running scenario, as seen by tracemalloc
+  """
+  tracemalloc.start()
+  tracemalloc.reset_peak()
+  run_once(scenario, ticks, seed, engine)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return peak
+
+def benchmark(name, scenario, scale, repeat, seed, engine, measure_memory):
+  ticks = max(1, int(scenario["ticks"] * scale))
+  elapsed = None
+  for i in range(repeat):
+    run_elapsed, packets, in_order_rx_seq = run_once(scenario, ticks, seed, engine)
+    if (elapsed is None or run_elapsed < elapsed):
+      elapsed = run_elapsed
+  result = {"name": name, "ticks": ticks, "engine": engine, "seconds": elapsed,
+            "ticks_per_sec": ticks / elapsed, "packets_per_sec": packets / elapsed,
+            "packets": packets, "in_order_rx_seq": in_order_rx_seq, "peak_memory": None}
+  if (measure_memory):
+    result["peak_memory"] = peak_memory(scenario, ticks, seed, engine)
+  return result
+
+def compare(results, baseline, tolerance):
+  """
+  Compare results against the baseline results and return a list of regressions,
+  each a human-readable string
+  """
+  regressions = []
+  for result in results:
+    base = baseline.get(result["name"])
+    if (base is None):
+      continue
+    if (base["ticks"] != result["ticks"] or base["engine"] != result["engine"]):
+      regressions.append(result["name"] + ": ran " + str(result["ticks"]) + " ticks with the " + result["engine"] +
+                         " engine but the baseline ran " + str(base["ticks"]) + " with the " + base["engine"] + " engine")
+      continue
+    if (result["in_order_rx_seq"] != base["in_order_rx_seq"]):
+      # Not a speed regression, but the benchmark no longer simulates the same thing
+      regressions.append(result["name"] + ": in_order_rx_seq changed from " + str(base["in_order_rx_seq"]) +
+                         " to " + str(result["in_order_rx_seq"]))
+    if (result["ticks_per_sec"] < base["ticks_per_sec"] * (1 - tolerance)):
+      regressions.append(result["name"] + ": ticks/sec dropped from %.0f to %.0f" % (base["ticks_per_sec"], result["ticks_per_sec"]))
+    if (result["peak_memory"] is not None and base.get("peak_memory") is not None and
+        result["peak_memory"] > base["peak_memory"] * (1 + tolerance)):
+      regressions.append(result["name"] + ": peak memory grew from %d to %d bytes" % (base["peak_memory"], result["peak_memory"]))
+  return regressions
+
+def print_result(result, base = None):
+  line = "%-22s %10.0f ticks/sec %10.0f packets/sec" % (result["name"], result["ticks_per_sec"], result["packets_per_sec"])
+  if (result["peak_memory"] is not None):
+    line += " %8.1f KiB peak" % (result["peak_memory"] / 1024.0)
+  if (base is not None and base["ticks"] == result["ticks"]):
+    line += "  (%+.1f%% ticks/sec vs. baseline)" % (100.0 * (result["ticks_per_sec"] / base["ticks_per_sec"] - 1))
+  print(line)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Benchmark the simulator on a fixed set of scenarios')
+  parser.add_argument('--scenarios', dest='scenarios', type=str, help='comma-separated scenarios to run, default all of: ' + ",".join(SCENARIOS), default=",".join(SCENARIOS))
+  parser.add_argument('--scale', dest='scale', type=float, help='multiply the number of ticks of every scenario by this, default 1', default=1.0)
+  parser.add_argument('--repeat', dest='repeat', type=int, help='timed runs per scenario, the fastest is kept, default 3', default=3)
+  parser.add_argument('--seed', dest='seed', type=int, help='random seed, default 1', default=1)
+  parser.add_argument('--engine', dest='engine', type=str, help='tick or event, default tick', default="tick")
+  parser.add_argument('--no_memory', dest='memory', action='store_false', help='skip the tracemalloc run that measures peak memory')
+  parser.add_argument('--save', dest='save', type=str, help='write the results to this JSON file as a baseline')
+  parser.add_argument('--compare', dest='compare', type=str, help='compare the results against this JSON baseline')
+  parser.add_argument('--tolerance', dest='tolerance', type=float, help='allowed relative slowdown or memory growth before a scenario counts as regressed, default 0.1', default=0.1)
+  args = parser.parse_args()
+
+  names = args.scenarios.split(",")
+  for name in names:
+    if (name not in SCENARIOS):
+      raise argparse.ArgumentTypeError("Unknown scenario " + name + ", must be one of " + ",".join(SCENARIOS))
+  if (args.engine not in ["tick", "event"]):
+    raise argparse.ArgumentTypeError("Invalid engine, must be tick or event")
+  if (args.repeat < 1):
+    raise argparse.ArgumentTypeError("repeat must be at least 1")
+
+  baseline = {}
+  if (args.compare is not None):
+    with open(args.compare) as fh:
+      baseline = dict((result["name"], result) for result in json.load(fh)["results"])
+
+  results = []
+  for name in names:
+    result = benchmark(name, SCENARIOS[name], args.scale, args.repeat, args.seed, args.engine, args.memory)
+    print_result(result, baseline.get(name))
+    results.append(result)
+
+  if (args.save is not None):
+    with open(args.save, "w") as fh:
+      json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                 "seed": args.seed, "repeat": args.repeat, "results": results}, fh, indent = 2)
+
+  if (args.compare is not None):
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+      print("REGRESSION " + regression)
+    if (len(regressions) > 0):
+      sys.exit(1)
+    print("No regressions against " + args.compare)
@@ -0,0 +1,44 @@
+"""
+Snapshots of a running simulation, so that long runs can be stopped and resumed.
+
+A checkpoint is the whole engine.Simulation object (host with its unacked packets
+and TimeoutCalculator, link queue, pdbox and packet counters) together with the
+state of the random number generator and the parameters the run was started with,
+pickled and gzip-compressed into one file. Resuming from it and running to the
+same end tick gives exactly the same results as an uninterrupted run.
+"""
+
+import gzip
+import os
+import pickle
+import random
+
+CHECKPOINT_VERSION = 4           # bump when the contents of a checkpoint change
+
+def save_checkpoint(path, sim, params):
+  """
+  Write a snapshot of sim, the global random state and the run's params to path.
+  The file is replaced atomically, so a crash while saving leaves the previous
+  checkpoint intact.
+  """
+  state = {"version": CHECKPOINT_VERSION,
+           "params": params,
+           "random_state": random.getstate(),
+           "sim": sim}
+  tmp_path = path + ".tmp"
+  with gzip.open(tmp_path, "wb") as fh:
+    pickle.dump(state, fh, protocol = pickle.HIGHEST_PROTOCOL)
+  os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+  """
+  Read a snapshot written by save_checkpoint, restore the global random state
+  and return (sim, params)
+  """
+  with gzip.open(path, "rb") as fh:
+    state = pickle.load(fh)
+  if (state.get("version") != CHECKPOINT_VERSION):
+    raise ValueError("Checkpoint " + path + " has version " + str(state.get("version")) +
+                     ", expected " + str(CHECKPOINT_VERSION))
+  random.setstate(state["random_state"])
+  return (state["sim"], state["params"])
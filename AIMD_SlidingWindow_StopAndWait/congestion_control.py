@@ -0,0 +1,250 @@
+"""
+Congestion control algorithms for AimdHost.
+
+A congestion controller owns the sender's window (in packets, possibly fractional)
+and AimdHost calls into it on these events:
+
+  on_ack(host, tick, advanced)     an ACK moved the cumulative point (the host's
+                                   in_order_rx_seq) up by advanced packets
+  on_dup_ack(host, tick, dup_acks) an ACK did not move it, i.e., a packet arrived
+                                   above a gap; dup_acks counts these in a row
+  on_timeout(host, tick, seq_num)  the retransmission timer of unacked packet seq_num
+                                   fired; the host retransmits it whatever this does
+
+on_ack and on_dup_ack return True to ask the host to retransmit the first missing
+packet, in_order_rx_seq + 1, right away (fast retransmit), without waiting for its
+timer. The hooks can read the host's in_order_rx_seq, max_seq, unacked and
+timeout_calculator, but only change the window and their own state.
+
+  AimdControl  the original AimdHost behavior: slow start, +1/window per ACK,
+               halving on timeouts at most once per RTT, no fast retransmit
+  Reno         fast retransmit after 3 duplicate ACKs and fast recovery (RFC 5681)
+  NewReno      Reno that stays in recovery across partial ACKs (RFC 6582)
+  Cubic        CUBIC window growth (RFC 8312) with Reno's loss recovery
+
+Like hosts, controllers have state_signature() and shift() for steady-state
+detection (see engine.py and deadlines.py).
+"""
+
+import math
+from deadlines import deadline_signature, hair_above_tick
+
+class AimdControl:
+  """
+  Additive increase, multiplicative decrease as AimdHost has always done it. Every
+  ACK, duplicate or not, grows the window, by 1 in slow start and by 1/window after
+  it. Every timeout halves the window, unless the window was already cut less than
+  an RTT ago, and ends slow start. Losses are only detected by timeouts.
+  """
+  def __init__(self):
+    self.window = 1             # We'll initialize window to 1
+    self.slow_start = True      # Are we in slow start?
+    self.next_decrease = -1     # When to next decrease your window; adds some hystersis
+    self.num_unshiftable = 0    # RTTs added to next_decrease that were a hair above a whole tick, see deadlines.py
+
+  def increase(self):
+    # The window increase rule is different for slow start and congestion avoidance.
+    # This is called on every ACK (not every RTT), so the increase is per ACK
+    if (self.slow_start):
+      self.window += 1
+    else:
+      self.window += 1/self.window
+
+  def on_ack(self, host, tick, advanced):
+    self.increase()
+    return False
+
+  def on_dup_ack(self, host, tick, dup_acks):
+    self.increase()
+    return False
+
+  def on_timeout(self, host, tick, seq_num):
+    # Multiplicative decrease, if it's time for the next decrease
+    # Cut window by half, but don't let it go below 1
+    half = self.window / 2
+    if half < 1:
+      self.window = 1
+    elif (half >= 1 and self.next_decrease <= tick):
+      self.window = half
+
+    # Make sure the next multiplicative decrease doesn't happen until an RTT later
+    if (hair_above_tick(host.timeout_calculator.mean_rtt)):
+      self.num_unshiftable += 1
+    self.next_decrease = tick + host.timeout_calculator.mean_rtt
+
+    # Exit slow start, whether you were in it or not
+    self.slow_start = False
+
+  def state_signature(self, tick, base):
+    # Any next_decrease <= tick allows a decrease on every future tick
+    return (self.window, self.slow_start, max(deadline_signature(self.next_decrease, tick), 0), self.num_unshiftable)
+
+  def shift(self, ticks, seqs):
+    self.next_decrease += ticks
+
+class Reno:
+  """
+  TCP Reno. Slow start grows the window by one per packet acked up to ssthresh,
+  congestion avoidance by about one per window. The third duplicate ACK in a row
+  triggers a fast retransmit of the missing packet, halves the window into ssthresh
+  and enters fast recovery, which the next ACK that moves the cumulative point ends.
+  A timeout halves ssthresh and restarts slow start from a window of 1.
+
+  TCP inflates the window by one per duplicate ACK during fast recovery, because it
+  counts packets that arrived above the gap as outstanding. AimdHost doesn't: they
+  leave host.unacked when they arrive, so the window is compared against the
+  packets actually in the network, as with SACK (RFC 6675). The window therefore
+  simply stays at ssthresh during recovery.
+
+  Every packet has its own timer here, so the other losses of a window time out
+  one after the other. As in RFC 6582, recover remembers the highest sequence
+  number sent when the window was last cut, and timeouts of packets up to recover
+  belong to that same episode and don't cut the window again.
+  """
+  DUP_ACK_THRESHOLD = 3         # duplicate ACKs that signal a loss
+
+  def __init__(self):
+    self.window = 1             # congestion window in packets
+    self.ssthresh = math.inf    # slow start threshold
+    self.in_recovery = False    # between a fast retransmit and the ACK that ends recovery
+    self.recover = -1           # max_seq when the window was last cut
+
+  def increase(self, host, tick, advanced):
+    """
+    Grow the window for advanced newly acked packets, outside of recovery
+    """
+    if (self.window < self.ssthresh):
+      self.window = min(self.window + advanced, max(self.ssthresh, self.window))
+    else:
+      self.window += advanced / self.window
+
+  def reduce(self, host, tick):  # new ssthresh after a loss
+    return max(self.window / 2, 2)
+
+  def enter_recovery(self, host, tick):
+    self.ssthresh = self.reduce(host, tick)
+    self.window = self.ssthresh
+    self.in_recovery = True
+    self.recover = host.max_seq
+
+  def on_ack(self, host, tick, advanced):
+    if (self.in_recovery):
+      self.in_recovery = False
+      return False
+    self.increase(host, tick, advanced)
+    return False
+
+  def on_dup_ack(self, host, tick, dup_acks):
+    if (self.in_recovery):
+      return False
+    if (dup_acks == self.DUP_ACK_THRESHOLD and self.new_loss(host)):
+      self.enter_recovery(host, tick)
+      return True
+    return False
+
+  def new_loss(self, host):     # can duplicate ACKs start another recovery?
+    return True
+
+  def on_timeout(self, host, tick, seq_num):
+    if (seq_num <= self.recover):
+      return                     # sent before the window was last cut
+    self.ssthresh = self.reduce(host, tick)
+    self.window = 1
+    self.in_recovery = False
+    self.recover = host.max_seq
+
+  def state_signature(self, tick, base):
+    # Once in_order_rx_seq (base) has passed recover, its exact value doesn't matter
+    return (self.window, self.ssthresh, self.in_recovery, max(self.recover - base, 0))
+
+  def shift(self, ticks, seqs):
+    self.recover += seqs
+
+class NewReno(Reno):
+  """
+  TCP NewReno. Recovery only ends once everything that was outstanding when it
+  started has been acked. An ACK that moves the cumulative point but not that far
+  (a partial ACK) means the next packet was lost too, and it is retransmitted right
+  away, so that a window with several losses is repaired in one recovery instead of
+  several timeouts. There is no window inflation to undo, see Reno. Duplicate ACKs
+  for packets sent before the window was last cut don't start another recovery.
+  """
+  def new_loss(self, host):
+    return host.in_order_rx_seq >= self.recover
+
+  def on_ack(self, host, tick, advanced):
+    if (not self.in_recovery):
+      self.increase(host, tick, advanced)
+      return False
+    if (host.in_order_rx_seq >= self.recover):
+      self.in_recovery = False   # full ACK
+      return False
+    return True                  # partial ACK
+
+class Cubic(NewReno):
+  """
+  CUBIC. After a loss the window grows along W(t) = C (t - K)^3 + W_max, where W_max
+  is the window at the last loss and K the time to get back to it: concave up to
+  W_max, flat around it and convex beyond it, independently of the RTT. It never
+  grows slower than an estimate of what Reno would have reached (the TCP-friendly
+  region). Losses cut the window to beta = 0.7 of its size, and W_max is lowered
+  further when losses come before reaching the previous W_max (fast convergence).
+
+  RFC 8312 measures t in seconds with C = 0.4; ticks have no fixed length, so here
+  t is measured in smoothed RTTs instead. Loss detection and recovery are NewReno's.
+  """
+  C    = 0.4                     # window growth scale, packets per RTT^3
+  BETA = 0.7                     # multiplicative decrease factor
+
+  def __init__(self):
+    NewReno.__init__(self)
+    self.w_max = 0.0             # window at the last loss
+    self.k = 0.0                 # RTTs from the start of the epoch to W_max
+    self.epoch_start = None      # tick at which the current growth epoch started
+    self.origin = 0.0            # W_max of the current epoch
+    self.w_est = 0.0             # what Reno's window would be in this epoch
+
+  def increase(self, host, tick, advanced):
+    if (self.window < self.ssthresh):
+      Reno.increase(self, host, tick, advanced)
+      return
+    rtt = max(host.timeout_calculator.mean_rtt, 1)
+    if (self.epoch_start is None):
+      self.epoch_start = tick
+      if (self.window < self.w_max):
+        self.k = ((self.w_max - self.window) / self.C) ** (1 / 3)
+        self.origin = self.w_max
+      else:
+        self.k = 0.0
+        self.origin = self.window
+      self.w_est = self.window
+    t = (tick - self.epoch_start) / rtt
+    target = self.origin + self.C * (t + 1 - self.k) ** 3 # where the window should be an RTT from now
+    if (target > self.window):
+      self.window += advanced * (target - self.window) / self.window
+    else:
+      self.window += advanced * 0.01 / self.window
+    # TCP-friendly region: grow at least as fast as Reno with the same beta would
+    self.w_est += advanced * 3 * (1 - self.BETA) / (1 + self.BETA) / self.window
+    if (self.w_est > self.window):
+      self.window = self.w_est
+
+  def reduce(self, host, tick):
+    self.epoch_start = None
+    if (self.window < self.w_max):
+      self.w_max = self.window * (1 + self.BETA) / 2 # fast convergence: leave room for new flows
+    else:
+      self.w_max = self.window
+    return max(self.window * self.BETA, 2)
+
+  def state_signature(self, tick, base):
+    epoch = None if self.epoch_start is None else self.epoch_start - tick
+    return Reno.state_signature(self, tick, base) + (self.w_max, self.k, epoch, self.origin, self.w_est)
+
+  def shift(self, ticks, seqs):
+    Reno.shift(self, ticks, seqs)
+    if (self.epoch_start is not None):
+      self.epoch_start += ticks
+
+# Names for the simulator's --cc option
+CONGESTION_CONTROLS = {"aimd": AimdControl, "reno": Reno, "newreno": NewReno, "cubic": Cubic}
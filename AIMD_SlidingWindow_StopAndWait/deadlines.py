@@ -0,0 +1,45 @@
+"""
+Float deadlines and steady-state detection.
+
+Timeouts, AIMD's next_decrease and CoDel's drop_next are float durations added to
+integer ticks, and the deadlines are only compared against whole ticks. A duration
+a hair above a whole number of ticks (e.g., 4.0000000000000005) gives a deadline
+one tick later at small ticks but rounds to the whole tick at large ones, so the
+same relative state can behave differently once the engine shifts it (see
+engine.run_fast_forward).
+
+Components that add such durations to ticks count the ones that are a hair above
+a whole tick in their own num_unshiftable and put it in their state_signature(),
+so a state only repeats if none came up in between: every later period then adds
+the same durations to ticks and rounds them the same way.
+"""
+
+import math
+
+# How far above a whole tick a float deadline has to be to be compared safely
+DEADLINE_EPSILON = 1e-6
+
+class UnstableSignature(Exception):
+  """
+  Raised by state_signature() methods when the state can't be compared safely
+  right now; the engine then just doesn't look for a repeat at this tick
+  """
+
+def hair_above_tick(duration):
+  """
+  Is duration, which is added to ticks, a hair above a whole number of ticks?
+  tick + duration then rounds to a whole tick for large enough ticks only, so the
+  same state behaves differently at different ticks, and can't be shifted safely.
+  """
+  return 0 < duration - math.floor(duration) < DEADLINE_EPSILON
+
+def deadline_signature(deadline, tick):
+  """
+  Signature of a float deadline that is only compared against whole ticks
+  (deadline <= tick): the number of ticks from tick to the first tick at or after
+  it. Raises UnstableSignature if the deadline is a hair above a whole tick (e.g.,
+  4352.0000000000005), since it may land on that tick once shifted.
+  """
+  if (hair_above_tick(deadline)):
+    raise UnstableSignature()
+  return math.ceil(deadline) - tick
@@ -0,0 +1,174 @@
+"""
+The engine drives a host, a link and a propagation delay box through simulated time.
+
+There are two ways of doing that:
+
+run() is the classic tick loop. It calls host.send(), link.tick() and pdbox.tick()
+on every tick, whether or not anything happens on that tick.
+
+run_events() is a discrete-event loop. It keeps a priority queue of the ticks at
+which something can happen: a packet arriving at the host out of the pdbox, the
+link dequeuing a packet, the host sending new packets or a retransmission timer
+firing. Ticks on which none of these happen are skipped. Every skipped tick would
+have been a no-op in the tick loop (no packets move, no timers fire and no random
+numbers are drawn), so both loops produce the same in_order_rx_seq for the same seed.
+
+run_fast_forward() runs either loop in chunks and, between chunks, looks for the
+whole state (host, link and pdbox) repeating with all ticks and sequence numbers
+shifted, which a lossless run without jitter settles into after a while. Once the
+state at tick t2 matches the state at an earlier tick t1, the run is periodic with
+period t2 - t1, so it jumps over as many whole periods as fit before end_tick by
+shifting ticks, sequence numbers and packet counters (including the link's drop
+and sojourn time counts), and runs the rest normally. deadlines.py explains how
+the components keep float deadlines from breaking the repeat.
+"""
+
+import heapq
+import logging
+from packet import *
+from deadlines import UnstableSignature
+
+log = logging.getLogger("sim.engine")
+
+class Simulation:
+  """
+  Wires a host to a link, the link to a pdbox, and the pdbox back to the host.
+
+  Data members of this class include:
+  tick: The next tick to be simulated
+  num_original: Number of packets sent for the first time
+  num_retransmitted: Number of retransmitted packets
+  metrics: Optional MetricsRecorder that records the state after each simulated tick
+  """
+  def __init__(self, host, link, pdbox):
+    self.host  = host
+    self.link  = link
+    self.pdbox = pdbox
+    self.tick  = 0               # next tick to be simulated
+    self.num_original      = 0   # packets sent for the first time
+    self.num_retransmitted = 0   # packets that were retransmissions
+    self.metrics = None          # optional metrics.MetricsRecorder, sampled after every tick
+
+  def step(self, tick):
+    """
+    Simulate one tick by running the host, then the link, then the pdbox
+    """
+    packets = self.host.send(tick)
+
+    if packets is not None:
+      # If a single packet is received, convert it to list
+      if type(packets) is Packet:
+        packets = [packets]
+
+      # Transmit the packets received from the host
+      for packet in packets:
+        if packet.retx:
+          self.num_retransmitted += 1
+        else:
+          self.num_original += 1
+        self.link.recv(packet, tick)
+
+    self.link.tick(tick, self.pdbox)
+    self.pdbox.tick(tick, self.host)
+    if (self.metrics is not None):
+      self.metrics.record_simulation(tick, self)
+
+  def run(self, end_tick):
+    """
+    Tick loop: simulate every tick from self.tick up to (but excluding) end_tick
+    """
+    for tick in range(self.tick, end_tick):
+      self.step(tick)
+    self.tick = max(self.tick, end_tick)
+
+  def state_signature(self):
+    """
+    Hashable summary of the state at self.tick, with ticks relative to self.tick and
+    sequence numbers relative to the host's in_order_rx_seq. None if the run depends
+    on random numbers (loss or jitter), which rules out fast-forwarding, or if it
+    can't be compared safely at this tick (see deadlines.py).
+    """
+    base = self.host.in_order_rx_seq
+    try:
+      parts = (self.host.state_signature(self.tick, base),
+               self.link.state_signature(self.tick, base),
+               self.pdbox.state_signature(self.tick, base))
+    except UnstableSignature:
+      return None
+    if (None in parts):
+      return None
+    return parts
+
+  def shift(self, ticks, seqs):
+    """
+    Move the whole simulation ticks into the future and seqs sequence numbers up
+    """
+    self.host.shift(ticks, seqs)
+    self.link.shift(ticks, seqs)
+    self.pdbox.shift(ticks, seqs)
+    self.tick += ticks
+
+  def run_fast_forward(self, end_tick, engine = "tick", interval = 64, history = 4096):
+    """
+    Simulate up to end_tick with the tick loop or the event loop, comparing the state
+    every interval ticks against the last history samples and skipping whole periods
+    once it repeats. Finds any period p with p / gcd(p, interval) <= history.
+    Returns the number of ticks that were skipped.
+    """
+    run_chunk = self.run_events if engine == "event" else self.run
+    if (self.metrics is not None or self.state_signature() is None):
+      # Metrics need every tick, and random runs never repeat exactly
+      run_chunk(end_tick)
+      return 0
+
+    seen = dict()                # state signature -> (tick, in_order_rx_seq, num_original, num_retransmitted, link stats)
+    while (self.tick < end_tick):
+      signature = self.state_signature()
+      if (signature is None):
+        # Not comparable at this tick, try again after the next chunk
+        run_chunk(min(end_tick, self.tick + interval))
+        continue
+      if (signature in seen):
+        prev_tick, prev_seq, prev_original, prev_retransmitted, prev_link_stats = seen[signature]
+        period = self.tick - prev_tick
+        num_periods = (end_tick - self.tick) // period
+        if (num_periods > 0):
+          skipped = num_periods * period
+          self.num_original      += num_periods * (self.num_original - prev_original)
+          self.num_retransmitted += num_periods * (self.num_retransmitted - prev_retransmitted)
+          self.link.extrapolate_stats(prev_link_stats, num_periods)
+          self.shift(skipped, num_periods * (self.host.in_order_rx_seq - prev_seq))
+          log.info("state repeats every %d ticks, skipped %d ticks to tick %d", period, skipped, self.tick)
+          run_chunk(end_tick)
+          return skipped
+      if (len(seen) >= history):
+        seen.clear()
+      seen[signature] = (self.tick, self.host.in_order_rx_seq, self.num_original, self.num_retransmitted, self.link.stats())
+      run_chunk(min(end_tick, self.tick + interval))
+    return 0
+
+  def run_events(self, end_tick):
+    """
+    Event loop: simulate only the ticks between self.tick and end_tick
+    on which an event is scheduled
+    """
+    events    = [self.tick]      # priority queue of ticks with pending events
+    scheduled = {self.tick}      # ticks already in events, to avoid duplicates
+    while (len(events) > 0):
+      tick = heapq.heappop(events)
+      scheduled.discard(tick)
+      if (tick >= end_tick):
+        break
+      self.step(tick)
+
+      # Schedule whatever each element wants to do next
+      for next_tick in [self.host.next_send_tick(tick + 1),
+                        self.link.next_event_tick(tick + 1),
+                        self.pdbox.next_event_tick(tick + 1)]:
+        if (next_tick is None):
+          continue
+        next_tick = max(next_tick, tick + 1)
+        if (next_tick not in scheduled):
+          heapq.heappush(events, next_tick)
+          scheduled.add(next_tick)
+    self.tick = max(self.tick, end_tick)
@@ -1,38 +1,32 @@
-import sys
-import matplotlib.pyplot as plt
+import argparse
+import csv
+import numpy
+from timeout_calculator import ewma_filter
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Smooth a step from 0 to 1 with an EWMA for one or more alphas and save the curves as CSV; plot them with plot_metrics.py')
+    parser.add_argument('alphas', type=float, nargs='+', help='EWMA gains to compare')
+    parser.add_argument('--output', dest='output', type=str, help='CSV file to write the smoothed curves to, default ewma.csv', default="ewma.csv")
+    args = parser.parse_args()
 
     # number of rtt samples
     NUM_SAMPLES = 100
 
-    # initialize all of them to zero
-    rtt_samples = [0.0] * NUM_SAMPLES
-
-    # rtt after being smoothed by EWMA
-    smooth_rtt = [0.0] * NUM_SAMPLES
-
     # Create a pattern where the first half of the samples are 0
-    for i in range(0, int(NUM_SAMPLES / 2)):
-      rtt_samples[i] = 0
-
     # And the next half are 1
-    for i in range(int(NUM_SAMPLES / 2), NUM_SAMPLES):
-      rtt_samples[i] = 1
-
-    # initialize mean rtt to zero
-    mean_rtt = 0
-
-    # get alpha from the command line
-    alpha = float(sys.argv[1])
-
-    # Iterate over all samples
-    for i in range(0, NUM_SAMPLES):
-        # Update mean rtt using EWMA equation
-        # mu <--- mu * (1 - alpha) + alpha * RTT
-        mean_rtt = mean_rtt * (1 - alpha) + alpha * rtt_samples[i]
-        # Write it into the ith location of smooth_rtt
-        smooth_rtt[i] = mean_rtt
-
-    plt.plot(smooth_rtt)
-    plt.show()
+    rtt_samples = numpy.zeros(NUM_SAMPLES)
+    rtt_samples[int(NUM_SAMPLES / 2):] = 1
+
+    curves = []
+    for alpha in args.alphas:
+        # Smooth all samples at once using the EWMA equation
+        # mu <--- mu * (1 - alpha) + alpha * RTT, with mean rtt initialized to zero
+        curves.append(ewma_filter(rtt_samples, alpha, 0.0))
+
+    # One row per sample, one column per alpha
+    with open(args.output, "w", newline = "") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["sample"] + ["alpha = " + str(alpha) for alpha in args.alphas])
+        for i in range(NUM_SAMPLES):
+            writer.writerow([i] + [curve[i] for curve in curves])
+    print("Wrote " + args.output)
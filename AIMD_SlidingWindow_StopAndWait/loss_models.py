@@ -0,0 +1,133 @@
+"""
+Loss processes for Link, as an alternative to its i.i.d. loss_ratio.
+
+A loss model decides, packet by packet, whether the link drops the packet it
+dequeues: Link.tick() calls lost() once per dequeued packet, in dequeue order.
+Random models draw their decisions in blocks of block_size packets at a time from
+their own NumPy Generator, so the per-packet cost is a list lookup, and the
+decision for the n-th packet only depends on the seed and n. Results are therefore
+the same however the run is split up, e.g., by checkpoints, and the Generator's
+state is saved along with the link in a checkpoint.
+
+  BernoulliLoss       every packet is lost independently with probability p
+  GilbertElliottLoss  two-state (good/bad) Markov chain for bursty loss
+  TraceLoss           replays a recorded loss pattern, e.g., from production
+
+parse_loss_model() builds one of these from the simulator's --loss_model option.
+NumPy is only imported once a random model is built, so runs without --loss_model
+don't need it.
+"""
+
+class BernoulliLoss:
+  """
+  Independent and identically distributed loss with probability p
+  """
+  def __init__(self, p, rng, block_size = 4096):
+    if (not 0 <= p <= 1):
+      raise ValueError("loss probability must be between 0 and 1")
+    self.p          = p
+    self.rng        = rng        # numpy.random.Generator the decisions are drawn from
+    self.block_size = block_size # decisions drawn at a time
+    self.block      = []         # drawn decisions, True for lost
+    self.index      = 0          # next decision to use from block
+  def refill(self):
+    self.block = (self.rng.random(self.block_size) < self.p).tolist()
+    self.index = 0
+  def lost(self):                # is the next packet lost?
+    if (self.index == len(self.block)):
+      self.refill()
+    self.index += 1
+    return self.block[self.index - 1]
+
+class GilbertElliottLoss:
+  """
+  Gilbert-Elliott burst loss. The link is either in the good or the bad state, and
+  switches from good to bad after each packet with probability p_good_bad and back
+  with probability p_bad_good, so the states last a geometrically distributed
+  number of packets with means 1/p_good_bad and 1/p_bad_good. Packets are lost
+  with probability loss_good in the good and loss_bad in the bad state.
+
+  Blocks are drawn as whole (good, bad) pairs of runs, so a block always ends at the
+  end of a bad run and the next one starts in the good state, as the chain would.
+  """
+  def __init__(self, p_good_bad, p_bad_good, rng, loss_good = 0.0, loss_bad = 1.0, block_size = 4096):
+    for p in [p_good_bad, p_bad_good]:
+      if (not 0 < p <= 1):
+        raise ValueError("Gilbert-Elliott transition probabilities must be in (0, 1]")
+    for p in [loss_good, loss_bad]:
+      if (not 0 <= p <= 1):
+        raise ValueError("Gilbert-Elliott loss probabilities must be between 0 and 1")
+    self.p_good_bad = p_good_bad
+    self.p_bad_good = p_bad_good
+    self.loss_good  = loss_good
+    self.loss_bad   = loss_bad
+    self.rng        = rng
+    # Number of (good, bad) run pairs per block, about block_size packets on average
+    self.num_pairs  = max(1, int(block_size / (1 / p_good_bad + 1 / p_bad_good)))
+    self.block      = []
+    self.index      = 0
+  def refill(self):
+    import numpy
+    runs = numpy.empty(2 * self.num_pairs, dtype = numpy.int64)
+    runs[0::2] = self.rng.geometric(self.p_good_bad, self.num_pairs) # packets in each good run
+    runs[1::2] = self.rng.geometric(self.p_bad_good, self.num_pairs) # packets in each bad run
+    loss_prob = numpy.repeat(numpy.tile([self.loss_good, self.loss_bad], self.num_pairs), runs)
+    self.block = (self.rng.random(len(loss_prob)) < loss_prob).tolist()
+    self.index = 0
+  def lost(self):
+    if (self.index == len(self.block)):
+      self.refill()
+    self.index += 1
+    return self.block[self.index - 1]
+
+class TraceLoss:
+  """
+  Replays a loss trace, one decision per packet (True or 1 for lost), starting over
+  at the beginning when it runs out if loop is set, and losing nothing after its
+  end otherwise
+  """
+  def __init__(self, trace, loop = True):
+    self.trace = [bool(x) for x in trace]
+    if (len(self.trace) == 0):
+      raise ValueError("Loss trace is empty")
+    self.loop  = loop
+    self.index = 0
+  @classmethod
+  def from_file(cls, path, loop = True):
+    """
+    Read a trace of 0s (delivered) and 1s (lost) from a text file. Anything else,
+    e.g., whitespace, commas or newlines between the digits, is ignored.
+    """
+    with open(path) as fh:
+      return cls([c == "1" for c in fh.read() if c in "01"], loop)
+  def lost(self):
+    if (self.index == len(self.trace)):
+      if (not self.loop):
+        return False
+      self.index = 0
+    self.index += 1
+    return self.trace[self.index - 1]
+
+def parse_loss_model(spec, loss_ratio, seed):
+  """
+  Build a loss model from a --loss_model spec:
+
+    bernoulli                     i.i.d. loss with probability loss_ratio, in blocks
+    gilbert:P_GB,P_BG[,LG,LB]     GilbertElliottLoss(P_GB, P_BG, loss_good=LG, loss_bad=LB)
+    trace:FILE                    TraceLoss.from_file(FILE), looped
+
+  The random models get their own Generator seeded with seed.
+  """
+  # Imported here so that the simulator itself does not depend on NumPy
+  import numpy
+  name, _, params = spec.partition(":")
+  if (name == "bernoulli"):
+    return BernoulliLoss(loss_ratio, numpy.random.default_rng(seed))
+  elif (name == "gilbert"):
+    values = [float(v) for v in params.split(",")]
+    if (len(values) not in [2, 4]):
+      raise ValueError("gilbert loss model takes P_GB,P_BG or P_GB,P_BG,LOSS_GOOD,LOSS_BAD")
+    return GilbertElliottLoss(values[0], values[1], numpy.random.default_rng(seed), *values[2:])
+  elif (name == "trace"):
+    return TraceLoss.from_file(params)
+  raise ValueError("Invalid loss model " + spec + ", must be bernoulli, gilbert:P_GB,P_BG[,LG,LB] or trace:FILE")
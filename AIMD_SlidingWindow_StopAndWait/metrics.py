@@ -0,0 +1,160 @@
+"""
+Per-run recording of the simulator's time series with constant memory use.
+
+A MetricsRecorder is attached to an engine.Simulation and records, after every
+simulated tick, these series:
+
+  window       sender's window in packets (1 for StopAndWait)
+  rtt          most recent RTT sample
+  timeout      current retransmission timeout
+  queue_depth  packets queued at the link
+  goodput      packets received in order so far, i.e., in_order_rx_seq + 1
+
+Ticks are grouped into blocks of decimation ticks and each block is reduced to one
+row. In "sample" mode a row holds the values at the last recorded tick of the block.
+In "minmax" mode it holds the minimum and maximum of each series over the block, in
+columns named <series>_min and <series>_max, which keeps spikes visible in plots.
+With the event engine, only ticks on which something happened are recorded; the
+state doesn't change in between, and blocks without any such tick produce no row.
+
+Rows are buffered in chunks of chunk_size and appended to disk as the run proceeds.
+The on-disk format is a directory holding meta.json plus one file per column
+(<column>.f64) of raw little-endian float64 values, which read_metrics() loads back
+as NumPy arrays. Without a directory, only the most recent chunk_size rows are kept.
+"""
+
+import array
+import json
+import os
+import sys
+
+SERIES = ["window", "rtt", "timeout", "queue_depth", "goodput"]
+
+class MetricsRecorder:
+  def __init__(self, path=None, decimation=1, mode="sample", chunk_size=4096):
+    if (mode not in ["sample", "minmax"]):
+      raise ValueError("Invalid metrics mode " + str(mode) + ", must be sample or minmax")
+    if (decimation < 1):
+      raise ValueError("decimation must be at least 1")
+    self.path       = path       # directory to write columns to, or None
+    self.decimation = decimation # ticks per row
+    self.mode       = mode       # "sample" or "minmax"
+    self.chunk_size = chunk_size # rows buffered before they are flushed
+    if (mode == "sample"):
+      self.columns = ["tick"] + SERIES
+    else:
+      self.columns = ["tick"] + [name + suffix for name in SERIES for suffix in ["_min", "_max"]]
+    self.buffers = dict((column, array.array("d")) for column in self.columns)
+    self.rows_written = 0        # rows already flushed to disk
+    self.block      = None       # index of the block being accumulated
+    self.block_tick = None       # tick of the row for the current block
+    self.low        = None       # per-series minimum (minmax) or last value (sample) in the block
+    self.high       = None       # per-series maximum in the block (minmax only)
+
+    if (path is not None):
+      os.makedirs(path, exist_ok = True)
+      with open(os.path.join(path, "meta.json"), "w") as fh:
+        json.dump({"columns": self.columns, "decimation": decimation, "mode": mode,
+                   "format": "one little-endian float64 file per column, named <column>.f64"}, fh, indent = 2)
+      for column in self.columns:
+        open(self.column_file(column), "wb").close()
+
+  def column_file(self, column):
+    return os.path.join(self.path, column + ".f64")
+
+  def record(self, tick, values):
+    """
+    Record the values of SERIES (in that order) at tick
+    """
+    block = tick // self.decimation
+    if (block != self.block):
+      if (self.block is not None):
+        self.emit_row()
+      self.block = block
+      self.low   = list(values)
+      self.high  = list(values)
+      self.block_tick = tick if self.mode == "sample" else block * self.decimation
+    elif (self.mode == "sample"):
+      self.low = list(values)
+      self.block_tick = tick
+    else:
+      for i in range(len(values)):
+        if (values[i] < self.low[i]):
+          self.low[i] = values[i]
+        elif (values[i] > self.high[i]):
+          self.high[i] = values[i]
+
+  def record_simulation(self, tick, sim):
+    """
+    Record the state of an engine.Simulation after it has simulated tick
+    """
+    host = sim.host
+    self.record(tick, [getattr(host, "window", 1),
+                       host.timeout_calculator.rtt_sample,
+                       host.timeout_calculator.timeout,
+                       len(sim.link),
+                       host.in_order_rx_seq + 1])
+
+  def emit_row(self):
+    self.buffers["tick"].append(self.block_tick)
+    if (self.mode == "sample"):
+      for i in range(len(SERIES)):
+        self.buffers[SERIES[i]].append(self.low[i])
+    else:
+      for i in range(len(SERIES)):
+        self.buffers[SERIES[i] + "_min"].append(self.low[i])
+        self.buffers[SERIES[i] + "_max"].append(self.high[i])
+    if (len(self.buffers["tick"]) >= self.chunk_size):
+      self.flush()
+
+  def flush(self):
+    """
+    Append buffered rows to disk, or drop all but the newest chunk_size rows
+    if there is no directory to write to
+    """
+    if (self.path is None):
+      for column in self.columns:
+        del self.buffers[column][:-self.chunk_size]
+      return
+    self.rows_written += len(self.buffers["tick"])
+    for column in self.columns:
+      with open(self.column_file(column), "ab") as fh:
+        buf = self.buffers[column]
+        if (sys.byteorder != "little"):
+          buf = array.array("d", buf)
+          buf.byteswap()
+        buf.tofile(fh)
+      del self.buffers[column][:]
+
+  def close(self):
+    """
+    Write out the row of the last block and everything still buffered
+    """
+    if (self.block is not None):
+      self.emit_row()
+      self.block = None
+    self.flush()
+
+  def truncate_to_checkpoint(self):
+    """
+    After resuming from a checkpoint, discard rows that were flushed after the
+    checkpoint was taken; they will be recorded again
+    """
+    if (self.path is None):
+      return
+    for column in self.columns:
+      with open(self.column_file(column), "r+b") as fh:
+        fh.truncate(self.rows_written * 8)
+
+def read_metrics(path):
+  """
+  Load a metrics directory written by MetricsRecorder as a dict mapping
+  column names to NumPy arrays
+  """
+  import numpy
+  with open(os.path.join(path, "meta.json")) as fh:
+    meta = json.load(fh)
+  columns = dict((column, numpy.fromfile(os.path.join(path, column + ".f64"), dtype = "<f8"))
+                 for column in meta["columns"])
+  num_rows = min(len(values) for values in columns.values())
+  return dict((column, values[:num_rows]) for (column, values) in columns.items())
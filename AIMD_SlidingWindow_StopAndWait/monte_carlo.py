@@ -0,0 +1,155 @@
+"""
+Multi-seed Monte Carlo runs of one scenario, with confidence intervals and early stopping.
+
+With loss, the result of a single seed says little. This runs the same scenario
+(see sweep.make_point) for seeds first_seed, first_seed + 1, ... across a pool of
+worker processes. Each seed's goodput (in-order packets per tick) and number of
+retransmissions are added to running mean and variance estimates (Welford's
+algorithm), so nothing is kept per seed. Once at least min_seeds have run and the
+confidence interval of the mean goodput is no wider than the requested width, no
+more seeds are submitted and the few runs still queued are cancelled. Seeds are
+submitted as results come in, at most QUEUED_PER_PROCESS per worker at a time, so
+workers don't run far past the point where the interval is narrow enough.
+
+Results are consumed in seed order, whatever order the workers finish them in, so
+the seeds used, and hence the answer, don't depend on the number of processes.
+
+Example: mean goodput of AIMD with 1% loss to within +-0.005 (width 0.01), 95% confidence
+
+python3 monte_carlo.py --host_type Aimd --rtt_min 10 --queue_limit 20 --loss_ratio 0.01 --ticks 10000 --ci_width 0.01
+"""
+
+import argparse
+import json
+import math
+import os
+from collections import deque
+from multiprocessing import Pool
+from sweep import *
+
+# Seeds submitted to the pool at a time per worker process, enough to keep every
+# worker busy while results are consumed in seed order
+QUEUED_PER_PROCESS = 2
+
+class RunningStats:
+  """
+  Streaming mean and variance of a series of samples (Welford's algorithm)
+
+  Data members of this class include:
+  count: Number of samples so far
+  mean: Mean of the samples so far
+  m2: Sum of squared differences from the current mean
+  """
+  def __init__(self):
+    self.count = 0
+    self.mean  = 0.0
+    self.m2    = 0.0
+
+  def add(self, x):
+    self.count += 1
+    delta = x - self.mean
+    self.mean += delta / self.count
+    self.m2   += delta * (x - self.mean)
+
+  def variance(self):            # unbiased sample variance
+    if (self.count < 2):
+      return math.inf
+    return self.m2 / (self.count - 1)
+
+  def half_width(self, confidence):
+    """
+    Half the width of the confidence interval of the mean, using Student's t
+    distribution with count - 1 degrees of freedom
+    """
+    if (self.count < 2):
+      return math.inf
+    # Imported here so that importing this module does not need SciPy
+    from scipy.stats import t
+    return t.ppf((1 + confidence) / 2, self.count - 1) * math.sqrt(self.variance() / self.count)
+
+def run_seeds(scenario, first_seed, min_seeds, max_seeds, confidence, ci_width, relative = False, processes = None, output = None):
+  """
+  Run scenario (a point from sweep.make_point, whose seed is ignored) for up to
+  max_seeds seeds and return (goodput stats, retransmission stats, whether the
+  requested width was reached). With relative, ci_width is a fraction of the mean.
+  If output is given, per-seed results are appended to it as JSON lines.
+  """
+  if (processes is None):
+    processes = os.cpu_count() or 1
+  goodput = RunningStats()
+  retransmissions = RunningStats()
+  converged = False
+  pending = deque()              # AsyncResults of the submitted seeds, in seed order
+  next_seed = first_seed
+  fh = open(output, "a") if output is not None else None
+  pool = Pool(processes)
+  try:
+    while (True):
+      # Keep a bounded number of seeds queued ahead of the one consumed next
+      while (len(pending) < QUEUED_PER_PROCESS * processes and next_seed < first_seed + max_seeds):
+        point = dict(scenario)
+        point["seed"] = next_seed
+        pending.append(pool.apply_async(run_point, (point,)))
+        next_seed += 1
+      if (len(pending) == 0):
+        break
+      result = pending.popleft().get()
+      goodput.add(result["throughput"])
+      retransmissions.add(result["num_retransmitted"])
+      if (fh is not None):
+        fh.write(json.dumps(result) + "\n")
+        fh.flush()
+      width = 2 * goodput.half_width(confidence)
+      target = ci_width * abs(goodput.mean) if relative else ci_width
+      print("seed %d: goodput %.6f, %d retransmissions; mean goodput %.6f, CI width %.6f" %
+            (result["seed"], result["throughput"], result["num_retransmitted"], goodput.mean, width))
+      if (goodput.count >= min_seeds and width <= target):
+        converged = True
+        break
+  finally:
+    pool.terminate()             # cancel the seeds that are no longer needed
+    pool.join()
+    if (fh is not None):
+      fh.close()
+  return (goodput, retransmissions, converged)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Run one scenario across many seeds in parallel until the confidence interval of the mean goodput is narrow enough')
+  parser.add_argument('--host_type', dest='host_type', type=str, help='StopAndWait, SlidingWindow or Aimd', required=True)
+  parser.add_argument('--rtt_min', dest='rtt_min', type=int, help='Minimum round-trip time in tick units', required=True)
+  parser.add_argument('--ticks', dest='ticks', type=int, help='Number of ticks to run each seed for', required=True)
+  parser.add_argument('--ci_width', dest='ci_width', type=float, help='stop once the confidence interval of the mean goodput (in packets per tick) is at most this wide', required=True)
+  parser.add_argument('--relative', dest='relative', action='store_true', help='ci_width is a fraction of the mean goodput, e.g., 0.02 for +-1%%')
+  parser.add_argument('--confidence', dest='confidence', type=float, help='confidence level, default 0.95', default=0.95)
+  parser.add_argument('--cc', dest='cc', type=str, help='congestion control for Aimd: aimd, reno, newreno or cubic, default aimd')
+  parser.add_argument('--window_size', dest='window_size', type=int, help='Window size in packets for sliding window sender')
+  parser.add_argument('--loss_ratio', dest='loss_ratio', type=float, help='loss probability, default 0', default=0.0)
+  parser.add_argument('--queue_limit', dest='queue_limit', type=int, help='max. size of link queue, default 1000000', default=1000000)
+  parser.add_argument('--engine', dest='engine', type=str, help='tick or event, default event', default="event")
+  parser.add_argument('--first_seed', dest='first_seed', type=int, help='first random seed, default 1', default=1)
+  parser.add_argument('--min_seeds', dest='min_seeds', type=int, help='always run at least this many seeds, default 10', default=10)
+  parser.add_argument('--max_seeds', dest='max_seeds', type=int, help='give up after this many seeds, default 1000', default=1000)
+  parser.add_argument('--processes', dest='processes', type=int, help='number of worker processes, default one per CPU', default=None)
+  parser.add_argument('--output', dest='output', type=str, help='JSON lines file to append per-seed results to')
+  args = parser.parse_args()
+
+  if (args.host_type == "SlidingWindow" and args.window_size is None):
+    raise argparse.ArgumentTypeError("window_size must be defined for host_type SlidingWindow")
+  if (args.min_seeds < 2 or args.max_seeds < args.min_seeds):
+    raise argparse.ArgumentTypeError("need 2 <= min_seeds <= max_seeds")
+  if (not 0 < args.confidence < 1):
+    raise argparse.ArgumentTypeError("confidence must be between 0 and 1")
+
+  scenario = make_point(args.host_type, args.window_size, None, args.rtt_min, args.loss_ratio,
+                        args.queue_limit, args.ticks, args.engine, args.cc)
+  goodput, retransmissions, converged = run_seeds(scenario, args.first_seed, args.min_seeds, args.max_seeds,
+                                                  args.confidence, args.ci_width, args.relative,
+                                                  args.processes, args.output)
+
+  level = str(round(100 * args.confidence, 2)) + "%"
+  print()
+  if (not converged):
+    print("Confidence interval is still wider than requested after " + str(goodput.count) + " seeds")
+  print("Seeds: " + str(goodput.count))
+  print("Mean goodput %.6f packets/tick, %s CI +-%.6f" % (goodput.mean, level, goodput.half_width(args.confidence)))
+  print("Mean retransmissions %.2f, %s CI +-%.2f" % (retransmissions.mean, level, retransmissions.half_width(args.confidence)))
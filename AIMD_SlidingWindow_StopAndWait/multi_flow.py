@@ -0,0 +1,292 @@
+"""
+Many AIMD flows competing for one bottleneck link.
+
+simulator.py wires one host to one Link and one PropDelayBox. Here thousands of
+flows share a single bottleneck, and per-flow state is stored as a structure of
+NumPy arrays (one entry per flow) instead of one AimdHost and TimeoutCalculator
+object per flow. Sending, ACK processing and timeout processing for all flows are
+vectorised updates that run once per tick.
+
+The per-flow algorithm is the one in AimdHost: slow start, +1/window per ACK in
+congestion avoidance, halving the window on a timeout at most once per mean RTT,
+and the TimeoutCalculator EWMA with exponential backoff. The one difference is
+that each flow has a single retransmission timer rather than one timer per unacked
+packet, which is what allows timeouts to be processed as array operations. The
+timer is the one AimdHost would have armed for the earliest packet the flow lost,
+i.e., it fires at the tick that packet was sent plus the flow's timeout at the time
+it was sent. All packets the flow lost so far are then retransmitted. Spurious
+timeouts of packets that are merely delayed in the queue are not modelled.
+
+Packets are (flow, sent tick, timeout tick) triples held in array-backed FIFOs for
+the link queue and the propagation delay box. New packets from different flows are
+interleaved in random order before they reach the link, so tail drops are not
+biased by flow id.
+
+Example: 10,000 flows on a link of 100 packets per tick
+
+python3 multi_flow.py --flows 10000 --ticks 5000 --rtt_min 10 --link_capacity 100 --queue_limit 1000
+"""
+
+import argparse
+import numpy
+from timeout_calculator import MIN_TIMEOUT, MAX_TIMEOUT
+
+class PacketFifo:
+  """
+  FIFO of packets stored as parallel arrays of flow ids, sent ticks, timeout
+  ticks (when the packet's retransmission timer fires, set when it is sent) and
+  ready ticks (the tick at which the packet can leave the FIFO)
+  """
+  def __init__(self, capacity = 1024):
+    self.flow     = numpy.empty(capacity, dtype = numpy.int64)
+    self.sent_ts  = numpy.empty(capacity, dtype = numpy.int64)
+    self.deadline = numpy.empty(capacity)
+    self.ready    = numpy.empty(capacity, dtype = numpy.int64)
+    self.head     = 0            # index of the first packet
+    self.tail     = 0            # index one past the last packet
+
+  def __len__(self):
+    return self.tail - self.head
+
+  def push(self, flow, sent_ts, deadline, ready):
+    num_new = len(flow)
+    if (self.tail + num_new > len(self.flow)):
+      # Out of room at the end: move live packets to the front, growing if needed
+      num_live = len(self)
+      capacity = max(len(self.flow), 2 * (num_live + num_new))
+      for name in ["flow", "sent_ts", "deadline", "ready"]:
+        old = getattr(self, name)
+        new = old if capacity == len(old) else numpy.empty(capacity, dtype = old.dtype)
+        new[:num_live] = old[self.head:self.tail]
+        setattr(self, name, new)
+      self.head, self.tail = 0, num_live
+    self.flow[self.tail:self.tail + num_new]    = flow
+    self.sent_ts[self.tail:self.tail + num_new]  = sent_ts
+    self.deadline[self.tail:self.tail + num_new] = deadline
+    self.ready[self.tail:self.tail + num_new]    = ready
+    self.tail += num_new
+
+  def pop(self, num):
+    """
+    Remove up to num packets from the head; returns their (flow, sent_ts, deadline) arrays
+    """
+    num = min(num, len(self))
+    start = self.head
+    self.head += num
+    return (self.flow[start:self.head].copy(), self.sent_ts[start:self.head].copy(),
+            self.deadline[start:self.head].copy())
+
+  def pop_ready(self, tick):
+    """
+    Remove the packets at the head whose ready tick is <= tick. Ready ticks must be
+    pushed in non-decreasing order, which holds for a constant propagation delay.
+    """
+    return self.pop(int(numpy.searchsorted(self.ready[self.head:self.tail], tick, side = "right")))
+
+class SharedBottleneck:
+  """
+  num_flows AIMD senders sharing one link with the given capacity (packets per tick),
+  queue_limit, i.i.d. loss_ratio and two-way propagation delay rtt_min.
+
+  Per-flow state, one array entry per flow:
+  window, slow_start, next_decrease: AimdHost's congestion control state
+  mean_rtt, rtt_var, timeout, ewma_init: TimeoutCalculator's state
+  inflight: packets sent that are neither acked nor known to be lost
+  lost: packets dropped by the network that the flow has not noticed yet
+  retx_pending: lost packets waiting to be retransmitted
+  loss_deadline: tick at which the timer of the earliest lost packet fires
+  delivered: packets acked so far
+  """
+  def __init__(self, num_flows, rtt_min, loss_ratio = 0.0, queue_limit = 1000000, capacity = 1, seed = 1):
+    self.num_flows   = num_flows
+    self.prop_delay  = rtt_min - 1
+    self.loss_ratio  = loss_ratio
+    self.queue_limit = queue_limit
+    self.capacity    = capacity
+    self.rng         = numpy.random.default_rng(seed)
+    self.alpha       = 0.125
+    self.beta        = 0.25
+    self.k           = 4.0
+
+    self.window        = numpy.ones(num_flows)
+    self.slow_start    = numpy.ones(num_flows, dtype = bool)
+    self.next_decrease = numpy.full(num_flows, -1.0)
+    self.mean_rtt      = numpy.zeros(num_flows)
+    self.rtt_var       = numpy.zeros(num_flows)
+    self.timeout       = numpy.full(num_flows, float(MIN_TIMEOUT))
+    self.ewma_init     = numpy.zeros(num_flows, dtype = bool)
+    self.inflight      = numpy.zeros(num_flows, dtype = numpy.int64)
+    self.lost          = numpy.zeros(num_flows, dtype = numpy.int64)
+    self.retx_pending  = numpy.zeros(num_flows, dtype = numpy.int64)
+    self.loss_deadline = numpy.full(num_flows, numpy.inf)
+    self.delivered     = numpy.zeros(num_flows, dtype = numpy.int64)
+    self.num_sent      = numpy.zeros(num_flows, dtype = numpy.int64)
+    self.num_retransmitted = numpy.zeros(num_flows, dtype = numpy.int64)
+    self.num_timeouts  = numpy.zeros(num_flows, dtype = numpy.int64)
+
+    self.link_queue = PacketFifo()
+    self.pdbox      = PacketFifo()
+    self.tick       = 0          # next tick to be simulated
+    self.num_dropped        = 0  # packets dropped at the tail of the queue or by random loss
+    self.timeout_ticks      = 0  # ticks on which at least one flow timed out
+    self.max_sync_timeouts  = 0  # most flows that timed out on the same tick
+
+  def process_timeouts(self, tick):
+    expired = numpy.flatnonzero((self.lost > 0) & (tick >= self.loss_deadline))
+    if (len(expired) == 0):
+      return
+    self.timeout_ticks += 1
+    self.max_sync_timeouts = max(self.max_sync_timeouts, len(expired))
+    self.num_timeouts[expired] += 1
+
+    # Exponential backoff, re-initializing the EWMA
+    self.timeout[expired]   = numpy.clip(self.timeout[expired] * 2, MIN_TIMEOUT, MAX_TIMEOUT)
+    self.ewma_init[expired] = False
+
+    # Multiplicative decrease, at most once per mean RTT, never below 1
+    half = self.window[expired] / 2
+    decrease = self.next_decrease[expired] <= tick
+    self.window[expired] = numpy.where(half < 1, 1.0, numpy.where(decrease, half, self.window[expired]))
+    self.next_decrease[expired] = tick + self.mean_rtt[expired]
+    self.slow_start[expired] = False
+
+    # The packets lost so far are now known to be lost and get retransmitted
+    self.retx_pending[expired] += self.lost[expired]
+    self.inflight[expired]     -= self.lost[expired]
+    self.lost[expired]          = 0
+    self.loss_deadline[expired] = numpy.inf
+
+  def send(self, tick):
+    # Like AimdHost, fill up the window: send while inflight < window
+    num_new = numpy.maximum(numpy.ceil(self.window).astype(numpy.int64) - self.inflight, 0)
+    retx = numpy.minimum(num_new, self.retx_pending)
+    self.retx_pending      -= retx
+    self.num_retransmitted += retx
+    self.num_sent          += num_new
+    self.inflight          += num_new
+
+    # Interleave the flows' packets in random order, then enqueue with tail drop
+    flows = numpy.repeat(numpy.arange(self.num_flows), num_new)
+    if (len(flows) == 0):
+      return
+    flows = self.rng.permutation(flows)
+    # Like AimdHost, arm each packet's timer with the flow's timeout as it is now
+    deadlines = tick + self.timeout[flows]
+    space = max(self.queue_limit - len(self.link_queue), 0)
+    accepted = flows[:space]
+    self.drop(flows[space:], deadlines[space:])
+    self.link_queue.push(accepted, numpy.full(len(accepted), tick), deadlines[:space],
+                         numpy.zeros(len(accepted), dtype = numpy.int64))
+
+  def link_tick(self, tick):
+    flows, sent_ts, deadlines = self.link_queue.pop(self.capacity)
+    if (len(flows) == 0):
+      return
+    if (self.loss_ratio > 0):
+      survived = self.rng.random(len(flows)) >= self.loss_ratio
+      self.drop(flows[~survived], deadlines[~survived])
+      flows, sent_ts, deadlines = flows[survived], sent_ts[survived], deadlines[survived]
+    self.pdbox.push(flows, sent_ts, deadlines, numpy.full(len(flows), tick + max(self.prop_delay, 1)))
+
+  def drop(self, flows, deadlines):
+    """
+    The network dropped packets of flows whose timers fire at deadlines
+    """
+    if (len(flows) == 0):
+      return
+    self.lost += numpy.bincount(flows, minlength = self.num_flows)
+    self.num_dropped += len(flows)
+    numpy.minimum.at(self.loss_deadline, flows, deadlines)
+
+  def process_acks(self, tick):
+    flows, sent_ts, _ = self.pdbox.pop_ready(tick)
+    if (len(flows) == 0):
+      return
+    rtt = (tick - sent_ts).astype(float)
+
+    # A flow can get several ACKs on one tick. The EWMA must see them one at a time,
+    # so process the first ACK of every flow, then the second, and so on.
+    order = numpy.argsort(flows, kind = "stable")
+    flows, rtt = flows[order], rtt[order]
+    group_starts = numpy.flatnonzero(numpy.r_[True, flows[1:] != flows[:-1]])
+    group_sizes  = numpy.diff(numpy.r_[group_starts, len(flows)])
+    rank = numpy.arange(len(flows)) - numpy.repeat(group_starts, group_sizes)
+    for r in range(int(rank.max()) + 1):
+      selected = rank == r
+      self.ack(flows[selected], rtt[selected], tick)
+
+  def ack(self, flows, rtt, tick):
+    """
+    Process one ACK for each of flows (which must be distinct), with RTT samples rtt
+    """
+    # TimeoutCalculator.update_timeout, first sample after (re)initialization
+    first = ~self.ewma_init[flows]
+    f, sample = flows[first], rtt[first]
+    self.mean_rtt[f]  = sample
+    self.rtt_var[f]   = sample / 2
+    self.timeout[f]   = self.mean_rtt[f] + self.k * self.rtt_var[f]
+    self.ewma_init[f] = True
+    # ... and every later sample
+    f, sample = flows[~first], rtt[~first]
+    self.rtt_var[f]  = self.rtt_var[f] * (1 - self.beta) + self.beta * numpy.abs(sample - self.mean_rtt[f])
+    self.mean_rtt[f] = self.mean_rtt[f] * (1 - self.alpha) + self.alpha * sample
+    self.timeout[f]  = numpy.clip(self.mean_rtt[f] + self.k * self.rtt_var[f], MIN_TIMEOUT, MAX_TIMEOUT)
+
+    self.inflight[flows]  -= 1
+    self.delivered[flows] += 1
+    # Additive increase: +1 per ACK in slow start, +1/window per ACK otherwise
+    self.window[flows] += numpy.where(self.slow_start[flows], 1.0, 1.0 / self.window[flows])
+
+  def step(self, tick):
+    """
+    Simulate one tick: flows send, then the link, then the pdbox delivers ACKs
+    """
+    self.process_timeouts(tick)
+    self.send(tick)
+    self.link_tick(tick)
+    self.process_acks(tick)
+
+  def run(self, end_tick):
+    for tick in range(self.tick, end_tick):
+      self.step(tick)
+    self.tick = max(self.tick, end_tick)
+
+  def summary(self):
+    """
+    Aggregate and fairness statistics of the run so far
+    """
+    ticks = max(self.tick, 1)
+    goodput = self.delivered / ticks
+    sum_squares = float((goodput ** 2).sum())
+    return {"flows": self.num_flows,
+            "ticks": self.tick,
+            "utilisation": float(self.delivered.sum()) / (ticks * self.capacity),
+            "jain_fairness": float(goodput.sum()) ** 2 / (self.num_flows * sum_squares) if sum_squares > 0 else 0.0,
+            "min_goodput": float(goodput.min()),
+            "max_goodput": float(goodput.max()),
+            "mean_window": float(self.window.mean()),
+            "num_sent": int(self.num_sent.sum()),
+            "num_retransmitted": int(self.num_retransmitted.sum()),
+            "num_dropped": self.num_dropped,
+            "num_timeouts": int(self.num_timeouts.sum()),
+            "timeout_ticks": self.timeout_ticks,
+            "max_sync_timeouts": self.max_sync_timeouts}
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Many AIMD flows sharing one bottleneck link')
+  parser.add_argument('--flows', dest='flows', type=int, help='Number of competing flows', required=True)
+  parser.add_argument('--ticks', dest='ticks', type=int, help='Number of ticks to run simulation for', required=True)
+  parser.add_argument('--rtt_min', dest='rtt_min', type=int, help='Minimum round-trip time in tick units', required=True)
+  parser.add_argument('--link_capacity', dest='link_capacity', type=int, help='bottleneck capacity in packets per tick, default 1', default=1)
+  parser.add_argument('--queue_limit', dest='queue_limit', type=int, help='max. queue size of the bottleneck, default 1000000', default=1000000)
+  parser.add_argument('--loss_ratio', dest='loss_ratio', type=float, help='i.i.d. loss probability, default 0', default=0.0)
+  parser.add_argument('--seed', dest='seed', type=int, help='random seed, default 1', default=1)
+  args = parser.parse_args()
+  if (args.rtt_min < 2):
+    raise argparse.ArgumentTypeError("rtt_min must be at least 2")
+
+  bottleneck = SharedBottleneck(args.flows, args.rtt_min, loss_ratio = args.loss_ratio, queue_limit = args.queue_limit,
+                                capacity = args.link_capacity, seed = args.seed)
+  bottleneck.run(args.ticks)
+  for key, value in bottleneck.summary().items():
+    print(key + ": " + str(value))
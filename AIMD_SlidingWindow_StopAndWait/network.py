@@ -1,39 +1,110 @@
 # Required for dropping packets at random
 import random
-import queue
+import heapq
+import logging
+from collections import Counter, deque
+from packet import packet_pool
+from queue_disciplines import DropTail
+
+log = logging.getLogger("sim.link")
 
 class PropDelayBox:
   """
   A class to delay packets by the propagation delay
   In our case, we'll use it to delay packets by the two-way propagation delay,
   i.e., RTT_min
+
+  Packets are kept in one bucket per delivery tick, so each tick only touches the
+  packets that are due on that tick. Each packet can have its own delay: jitter adds
+  a uniformly random 0 to jitter ticks on top of prop_delay, which also reorders
+  packets, and recv() takes an explicit per-packet delay.
   """
-  def __init__(self, prop_delay):
-    self.prop_delay_queue = []   # queue of packets being delayed
+  def __init__(self, prop_delay, jitter=0):
+    self.buckets    = dict()     # delivery tick -> list of packets to deliver on that tick
+    self.due_ticks  = []         # min-heap of the delivery ticks in self.buckets
+    self.num_queued = 0          # number of packets being delayed
     self.prop_delay = prop_delay # how much to delay them by
-  def recv(self, pkt, tick):     # enqueue packet after timestamping it
+    self.jitter     = jitter     # max. extra random delay per packet, 0 to disable
+  def recv(self, pkt, tick, delay=None): # enqueue packet after timestamping it
     pkt.pdbox_time = tick
-    self.prop_delay_queue += [pkt]
+    if (delay is None):
+      delay = self.prop_delay
+      if (self.jitter > 0):
+        delay += random.randint(0, self.jitter)
+    self.add_to_bucket([pkt], tick + max(delay, 1)) # a packet can't be delivered on the tick it arrives
+  def recv_batch(self, pkts, tick): # enqueue a batch of packets that all arrive on this tick
+    if (self.jitter > 0):
+      for pkt in pkts:
+        self.recv(pkt, tick)
+      return
+    for pkt in pkts:
+      pkt.pdbox_time = tick
+    self.add_to_bucket(pkts, tick + max(self.prop_delay, 1))
+  def add_to_bucket(self, pkts, delivery_tick):
+    if (delivery_tick not in self.buckets):
+      self.buckets[delivery_tick] = []
+      heapq.heappush(self.due_ticks, delivery_tick)
+    self.buckets[delivery_tick].extend(pkts)
+    self.num_queued += len(pkts)
   def tick(self, tick, host):    # execute this on every tick
-    to_deliver = []              # packets that are delivered this tick
-    for pkt in self.prop_delay_queue:
-      if (pkt.pdbox_time + self.prop_delay <= tick): # if propagation delay has been exceeded
-        assert(pkt.pdbox_time + self.prop_delay == tick)
-        to_deliver += [pkt]
+    while (len(self.due_ticks) > 0 and self.due_ticks[0] <= tick):
+      to_deliver = self.buckets.pop(heapq.heappop(self.due_ticks)) # packets delivered this tick
+      self.num_queued -= len(to_deliver)
+      for pkt in to_deliver:
         host.recv(pkt, tick)     # deliver to the host
-    self.prop_delay_queue = [x for x in self.prop_delay_queue if x not in to_deliver]
+        packet_pool.release(pkt) # the host is done with it
+  def next_event_tick(self, tick):  # earliest tick >= tick at which a packet is delivered
+    if (len(self.due_ticks) == 0):
+      return None
+    return self.due_ticks[0]
+  def state_signature(self, tick, base):
+    """
+    The packets being delayed, grouped by delivery tick relative to tick, or None
+    if delays are random
+    """
+    if (self.jitter > 0):
+      return None
+    return tuple((due_tick - tick, tuple(pkt.state_signature(tick, base) for pkt in self.buckets[due_tick]))
+                 for due_tick in sorted(self.due_ticks))
+  def shift(self, ticks, seqs):  # move everything being delayed ticks into the future and seqs up
+    buckets = dict()
+    for (due_tick, pkts) in self.buckets.items():
+      for pkt in pkts:
+        pkt.shift(ticks, seqs)
+      buckets[due_tick + ticks] = pkts
+    self.buckets   = buckets
+    self.due_ticks = [due_tick + ticks for due_tick in self.due_ticks] # same order, still a heap
+  def __len__(self):             # number of packets in flight
+    return self.num_queued
 
 class Link:
   """
-  A class to represent a link with a finite capacity of 1 packet per tick
-  We can generalize this to other capacities, but we're keeping the assignment simple
+  A class to represent a link with a finite capacity of capacity packets per tick
+  (1 by default). Packets are queued in a deque, and every tick the link moves up to
+  capacity packets from the head of the queue to the propagation delay box in one batch.
 
+  Which packets are queued and dequeued is up to the queue discipline qdisc (see
+  queue_disciplines.py), DropTail by default; the queue never holds more than
+  queue_limit packets whatever the discipline. Dequeued packets are then lost
+  independently with probability loss_ratio, or, if a loss_model (see
+  loss_models.py) is given, whenever its lost() says so.
+
+  Data members for statistics include:
+  sojourn: Counter of the ticks each transmitted packet spent in the queue
+  drops: Counter of dropped packets by reason, "queue_limit", "aqm" or "loss"
+  num_transmitted: Number of packets dequeued for transmission, lost or not
   """
-  def __init__(self, loss_ratio, queue_limit):
-    self.link_queue = queue.Queue()# queue of packets at the link
+  def __init__(self, loss_ratio, queue_limit, capacity=1, loss_model=None, qdisc=None):
+    self.link_queue = deque()    # queue of packets at the link
     self.loss_ratio = loss_ratio # probability of dropping packets when link dequeues them
     self.queue_limit= queue_limit# Max size of queue in packets
-  def recv(self, pkt):
+    self.capacity   = capacity   # packets dequeued per tick
+    self.loss_model = loss_model # decides which dequeued packets are lost instead of loss_ratio
+    self.qdisc      = qdisc if qdisc is not None else DropTail() # decides what to enqueue and dequeue
+    self.sojourn    = Counter()  # sojourn time in ticks -> number of transmitted packets
+    self.drops      = Counter()  # reason -> number of dropped packets
+    self.num_transmitted = 0     # packets dequeued for transmission
+  def recv(self, pkt, tick):
     """
     Function to receive a packet from a device connected at either
     ends of the link. Device here can represent an end host or any other
@@ -41,20 +112,84 @@ class Link:
 
     The device connected to the link needs to call the recv function to put
     packet on to the link. If link's queue is full, it starts dropping packets
-    and does not receive any more packets.
+    and does not receive any more packets. The queue discipline can drop
+    packets before that.
     """
-    if (self.link_queue.qsize() < self.queue_limit):
-      self.link_queue.put(pkt)   # append to the queue
-    # else:
-      print ("Link dropped packet because queue_limit was exceeded")
+    if (len(self.link_queue) >= self.queue_limit):
+      log.info("Link dropped packet %s because queue_limit was exceeded", pkt)
+      self.drop(pkt, tick, "queue_limit")
+    elif (not self.qdisc.enqueue(self, pkt, tick)):
+      log.info("@ tick %d queue discipline dropped arriving packet %s", tick, pkt)
+      self.drop(pkt, tick, "aqm")
+    else:
+      pkt.enqueue_tick = tick
+      self.link_queue.append(pkt)   # append to the queue
+  def drop(self, pkt, tick, reason): # count a dropped packet and recycle it
+    self.drops[reason] += 1
+    packet_pool.release(pkt)
   def tick(self, tick, pdbox):   # Execute on every tick
     """
     This function simulates what a link would do at each time instant (tick).
-    It dequeue packets and sends it to the propogation delay box
-    """
-    if (self.link_queue.qsize() != 0): # Dequeue from link queue if queue is not empty
-      head = self.link_queue.get()
-      if (random.uniform(0.0, 1) < (1 - self.loss_ratio)):
-        pdbox.recv(head, tick)   # dequeue and send to prop delay box
-      # else:
-        print ("@ tick ", tick, " link dropped a packet ")
+    It dequeues up to capacity packets and sends them to the propogation delay box.
+    Packets the queue discipline drops don't use up capacity.
+    """
+    if (len(self.link_queue) == 0): # Nothing to do if queue is empty
+      return
+    batch = []                   # packets that survive random loss
+    for i in range(self.capacity):
+      head = self.qdisc.dequeue(self, tick)
+      if (head is None):
+        break
+      self.sojourn[tick - head.enqueue_tick] += 1
+      self.num_transmitted += 1
+      if (self.loss_model is not None):
+        delivered = not self.loss_model.lost()
+      else:
+        delivered = random.uniform(0.0, 1) < (1 - self.loss_ratio)
+      if (delivered):
+        batch.append(head)
+      else:
+        log.info("@ tick %d link dropped packet %s", tick, head)
+        self.drop(head, tick, "loss")
+    if (len(batch) > 0):
+      pdbox.recv_batch(batch, tick)  # send the whole batch to prop delay box
+  def next_event_tick(self, tick):
+    """
+    Earliest tick >= tick at which the link has a packet to dequeue, or None
+    """
+    if (len(self.link_queue) != 0):
+      return tick
+    return None
+  def state_signature(self, tick, base):
+    """
+    The queue discipline's state and the queued packets in order, with ticks
+    relative to tick and sequence numbers relative to base, or None if the link
+    drops packets at random
+    """
+    if (self.loss_ratio > 0 or self.loss_model is not None):
+      return None
+    qdisc = self.qdisc.state_signature(tick)
+    if (qdisc is None):
+      return None
+    return (qdisc, tuple(pkt.state_signature(tick, base) for pkt in self.link_queue))
+  def shift(self, ticks, seqs):  # move the queued packets ticks into the future and seqs up
+    self.qdisc.shift(ticks)
+    for pkt in self.link_queue:
+      pkt.shift(ticks, seqs)
+  def stats(self):
+    """
+    Copy of the statistics counters, for extrapolate_stats()
+    """
+    return (Counter(self.sojourn), Counter(self.drops), self.num_transmitted)
+  def extrapolate_stats(self, prev_stats, times):
+    """
+    Add times more of whatever the counters grew by since prev_stats, for
+    fast-forwarding over repeats of a periodic run
+    """
+    prev_sojourn, prev_drops, prev_transmitted = prev_stats
+    for (counter, prev) in [(self.sojourn, prev_sojourn), (self.drops, prev_drops)]:
+      for key in list(counter):
+        counter[key] += times * (counter[key] - prev[key])
+    self.num_transmitted += times * (self.num_transmitted - prev_transmitted)
+  def __len__(self):             # number of packets queued at the link
+    return len(self.link_queue)
@@ -0,0 +1,63 @@
+"""
+Pacing of new transmissions for window-based hosts.
+
+Without pacing, SlidingWindowHost and AimdHost send as many new packets as the
+window has room for in a single tick. These line-rate bursts overflow small link
+queues even when the average rate would fit. With a Pacer, a host spaces out its
+new packets by mean_rtt / (gain * window) ticks, i.e., it sends a window's worth per
+smoothed RTT, about the rate ACKs come back at. gain > 1 lets the window keep
+growing while paced, as Linux does (gain 2 in slow start, 1.2 after it).
+Retransmissions are not paced.
+
+Send times are kept with fractional ticks, so rates above one packet per tick are
+paced too: several packets then go out on the same tick. Until the first RTT
+sample arrives, mean_rtt is 0 and the pacer uses initial_rtt instead, e.g., the
+RTT a connection handshake would have measured; without one the first window goes
+out at once.
+"""
+
+import math
+
+class Pacer:
+  """
+  Earliest send time of the next new packet, as the tick next_tick plus the
+  fraction frac in [0, 1) of a tick. Keeping the integer part separate means
+  shifting it by whole ticks, for steady-state detection, is exact.
+  """
+  def __init__(self, gain=1.2, initial_rtt=0):
+    if (gain <= 0):
+      raise ValueError("pacing gain must be positive")
+    self.gain      = gain        # how much faster than window / mean_rtt to send
+    self.initial_rtt = initial_rtt # RTT estimate to use before the first sample
+    self.next_tick = 0           # integer part of the next send time
+    self.frac      = 0.0         # fractional part of the next send time
+
+  def can_send(self, tick):      # may a new packet go out during tick, i.e., is next_tick + frac < tick + 1?
+    return self.next_tick <= tick
+
+  def on_send(self, tick, host):
+    """
+    Account for a new packet sent on tick, with the host's current window and RTT
+    """
+    if (self.next_tick < tick):  # idle for a while: don't save up a burst
+      self.next_tick = tick
+      self.frac = 0.0
+    rtt = host.timeout_calculator.mean_rtt
+    if (rtt == 0):
+      rtt = self.initial_rtt
+    self.frac += rtt / (self.gain * host.window)
+    carry = math.floor(self.frac)
+    self.next_tick += carry
+    self.frac -= carry
+
+  def next_send_tick(self, tick): # earliest tick >= tick at which can_send() holds
+    return max(tick, self.next_tick)
+
+  def state_signature(self, tick):
+    # A send time before tick has the same effect as tick itself
+    if (self.next_tick < tick):
+      return (0, 0.0)
+    return (self.next_tick - tick, self.frac)
+
+  def shift(self, ticks):
+    self.next_tick += ticks
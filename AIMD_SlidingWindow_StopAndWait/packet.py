@@ -7,12 +7,54 @@ class Packet:
   **seq_num**: Sequence number of the packet
   **pdbox_time**: Arrival time at the propogation delay box
   **retx**: To identify if the packet is a retransmission
+  **enqueue_tick**: Time at which the packet joined the link queue
   """
+  # No per-instance __dict__: long runs create tens of millions of packets
+  __slots__ = ("sent_ts", "seq_num", "pdbox_time", "retx", "enqueue_tick")
 
   def __init__(self, sent_ts, seq_num):
     self.sent_ts = sent_ts # sent timestamp, used to compute RTTs
     self.seq_num = seq_num # sequence number, starting from 0
     self.pdbox_time=-1     # arrival time at prop delay box
     self.retx = False      # Track whether the packet is a retransmission
+    self.enqueue_tick = -1 # arrival time at the link queue, for sojourn times
   def __repr__(self):      # Debugging: printing a packet object displays its sequence number
     return str(self.seq_num)
+  def state_signature(self, tick, base): # fields that matter from tick on, relative to tick and seq. number base
+    return (self.seq_num - base, self.sent_ts - tick, self.retx, self.enqueue_tick - tick)
+  def shift(self, ticks, seqs): # move the packet ticks into the future and seqs sequence numbers up
+    self.sent_ts += ticks
+    self.seq_num += seqs
+    if (self.pdbox_time >= 0):
+      self.pdbox_time += ticks
+    if (self.enqueue_tick >= 0):
+      self.enqueue_tick += ticks
+
+class PacketPool:
+  """
+  Free list of Packet objects that have left the network. Hosts get packets from
+  alloc() instead of constructing them, and the link (on a drop) and the pdbox
+  (after delivering to the host) hand them back with release(), so a long run
+  keeps reusing the same few packet objects.
+
+  A released packet must not be used again by whoever released it.
+  """
+  def __init__(self, max_free=4096):
+    self.free = []               # packets ready for reuse
+    self.max_free = max_free     # don't hold on to more than this many
+  def alloc(self, sent_ts, seq_num):
+    if (len(self.free) == 0):
+      return Packet(sent_ts, seq_num)
+    pkt = self.free.pop()
+    pkt.sent_ts = sent_ts
+    pkt.seq_num = seq_num
+    pkt.pdbox_time = -1
+    pkt.retx = False
+    pkt.enqueue_tick = -1
+    return pkt
+  def release(self, pkt):
+    if (len(self.free) < self.max_free):
+      self.free.append(pkt)
+
+# The pool shared by hosts, link and pdbox
+packet_pool = PacketPool()
@@ -1,50 +1,41 @@
-import matplotlib.pyplot as plt
-from network import *
+import csv
+import os
 import sys
-import argparse
-from stop_and_wait_host  import *
-from sliding_window_host import *
-from aimd_host import *
 
-window = []
-throughput = []
-ticks = []
-num_original = 0
-num_retransmitted = 0
+# simlog lives at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import simlog
+
+from sweep import *
+
+# Where the sweep results are stored; rerunning plotter.py resumes from this file
+RESULTS_FILE = "plotter_results.jsonl"
+# Throughput vs. window size, for plot_metrics.py
+CSV_FILE = "plotter_results.csv"
 
 if __name__ == '__main__':
-    for w in range(2, 400):
-        pdbox = PropDelayBox(10)
-        random.seed(1)
-        host = SlidingWindowHost(w)
-        link = Link(loss_ratio=0, queue_limit=1000000)
-            # Run the simulation for the specified number of ticks,
-            # by running the host, then the link, then the pdbox
-        for tick in range(0, 100000):
-            window.append(w)
-            packets = host.send(tick)
-            if packets is not None:
-            # If a single packet is received, convert it to list
-                if type(packets) is Packet:
-                    packets = [packets]
-                # Transmit the packets received from the host
-            for packet in packets:
-                if packet.retx:
-                    num_retransmitted += 1
-                else:
-                    num_original += 1
-                link.recv(packet)
-
-            link.tick(tick, pdbox)
-            pdbox.tick(tick, host)
-            throughput.append((host.in_order_rx_seq+1)/100000)
-            # window.append(host.window)
-            # ticks.append(tick)
-
-print('num_original: ', num_original)
-print('num_retransmitted: ', num_retransmitted)
-# print('window: ', window)
-# print('ticks: ', ticks)
-
-# plt.plot(ticks, window)
-# plt.show()
+    simlog.configure()
+
+    # Sweep window sizes 2 to 399 of a sliding window sender over a lossless link
+    # with a propagation delay box of 10 ticks, i.e., rtt_min of 11
+    points = [make_point("SlidingWindow", w, seed=1, rtt_min=11, loss_ratio=0,
+                         queue_limit=1000000, ticks=100000) for w in range(2, 400)]
+    results = run_sweep(points, RESULTS_FILE)
+    results.sort(key=lambda r: r["window"])
+
+    window = [r["window"] for r in results]
+    throughput = [r["throughput"] for r in results]
+    num_original = sum(r["num_original"] for r in results)
+    num_retransmitted = sum(r["num_retransmitted"] for r in results)
+
+    print('num_original: ', num_original)
+    print('num_retransmitted: ', num_retransmitted)
+    # print('window: ', window)
+    # print('throughput: ', throughput)
+
+    with open(CSV_FILE, "w", newline = "") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["window", "throughput"])
+        for row in zip(window, throughput):
+            writer.writerow(row)
+    print('Wrote ' + CSV_FILE + ', plot it with: python3 ../plot_metrics.py ' + CSV_FILE + ' --x window')
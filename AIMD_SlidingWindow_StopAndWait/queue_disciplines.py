@@ -0,0 +1,237 @@
+"""
+Queue disciplines for Link, to keep the standing queue short with AQM.
+
+Link owns the queue (a deque of packets, never longer than queue_limit) and asks
+its queue discipline two things:
+
+  enqueue(link, pkt, tick)  may the arriving pkt join the queue? False drops it
+  dequeue(link, tick)       remove and return the next packet to transmit, or None
+                            if the queue is empty. Packets the discipline drops on
+                            the way are handed to link.drop(pkt, tick, "aqm").
+
+Each packet is stamped with the tick it was enqueued at, so dequeue() can look at
+its sojourn time (time spent in the queue), and Link counts the sojourn times of
+all transmitted packets.
+
+  DropTail  only drops when the queue is full, as Link always did
+  RED       drops arrivals early, with a probability that grows with the average
+            queue length (Floyd and Jacobson, 1993)
+  CoDel     drops at the head while the sojourn time has stayed above a target for
+            an interval, more and more often until it is back below (RFC 8289)
+
+Like links, disciplines have state_signature() and shift() for steady-state
+detection (see engine.py and deadlines.py). parse_qdisc() builds one from the simulator's --qdisc option.
+"""
+
+import math
+import random
+from deadlines import deadline_signature, hair_above_tick
+
+class DropTail:
+  """
+  No active queue management: every packet is accepted while there is room in the
+  queue, and packets leave in FIFO order
+  """
+  def enqueue(self, link, pkt, tick):
+    return True
+  def dequeue(self, link, tick):
+    if (len(link.link_queue) == 0):
+      return None
+    return link.link_queue.popleft()
+  def state_signature(self, tick):
+    return ()
+  def shift(self, ticks):
+    pass
+
+class RED:
+  """
+  Random Early Detection. On every arrival the average queue length avg is updated
+  as an EWMA with weight w_q of the instantaneous queue length, and decayed over
+  the time the queue was empty as if empty queues had been sampled once per
+  transmission slot. Arrivals are dropped
+
+    never                              while avg < min_th
+    with probability rising to max_p   while min_th <= avg < max_th
+    always                             once avg >= max_th
+
+  The probability between the thresholds is spread out by the number of packets
+  accepted since the last drop, so drops are about evenly spaced instead of bunched.
+
+  Floyd and Jacobson use w_q = 0.002, for links that carry many more packets per
+  RTT than a flow here does (about rtt_min). With so few samples per RTT the
+  average lags the queue by many RTTs and AIMD stalls, so the default is 0.02.
+
+  Drop decisions come from the discipline's own random.Random, seeded with seed,
+  so they don't change the global random stream of link loss and jitter.
+  """
+  def __init__(self, min_th, max_th, max_p = 0.1, w_q = 0.02, seed = 0):
+    if (not 0 <= min_th < max_th):
+      raise ValueError("RED needs 0 <= min_th < max_th")
+    if (not 0 < max_p <= 1 or not 0 < w_q <= 1):
+      raise ValueError("RED max_p and w_q must be in (0, 1]")
+    self.min_th     = min_th     # avg. queue length where early drops start
+    self.max_th     = max_th     # avg. queue length where every arrival is dropped
+    self.max_p      = max_p      # drop probability just below max_th
+    self.w_q        = w_q        # EWMA weight of each queue length sample
+    self.rng        = random.Random(seed) # random numbers for drop decisions
+    self.avg        = 0.0        # average queue length
+    self.count      = -1         # packets accepted since the last drop, -1 while avg < min_th
+    self.idle_since = None       # tick at which the queue went empty, None if it isn't
+  def enqueue(self, link, pkt, tick):
+    qlen = len(link.link_queue)
+    if (self.idle_since is not None):
+      # Decay avg as if an empty queue had been sampled every transmission slot
+      self.avg *= (1 - self.w_q) ** ((tick - self.idle_since) * link.capacity)
+      self.idle_since = None
+    self.avg += self.w_q * (qlen - self.avg)
+
+    if (self.avg < self.min_th):
+      self.count = -1
+      return True
+    if (self.avg >= self.max_th):
+      self.count = 0
+      return False
+    self.count += 1
+    p_b = self.max_p * (self.avg - self.min_th) / (self.max_th - self.min_th)
+    p_a = 1.0 if self.count * p_b >= 1 else p_b / (1 - self.count * p_b)
+    if (self.rng.random() < p_a):
+      self.count = 0
+      return False
+    return True
+  def dequeue(self, link, tick):
+    if (len(link.link_queue) == 0):
+      return None
+    pkt = link.link_queue.popleft()
+    if (len(link.link_queue) == 0):
+      self.idle_since = tick + 1 # empty from the next transmission slot on
+    return pkt
+  def state_signature(self, tick):
+    return None                  # drops are random
+  def shift(self, ticks):
+    if (self.idle_since is not None):
+      self.idle_since += ticks
+
+class CoDel:
+  """
+  Controlled Delay (RFC 8289). When the sojourn time of dequeued packets has been
+  at least target for a whole interval, CoDel enters the dropping state and drops
+  a packet at the head, then the next one interval / sqrt(2) later, interval / sqrt(3)
+  after that, and so on, until a packet's sojourn time is below target again. A
+  queue with at most one packet left is never considered too long. If it has to
+  start dropping again soon after stopping, it resumes at about the rate it left off.
+
+  RFC 8289 suggests target = 5 ms and interval = 100 ms, the worst case RTT; here
+  both are in ticks, so interval should be about the largest RTT in ticks.
+  """
+  def __init__(self, target = 5, interval = 100):
+    if (not 0 < target < interval):
+      raise ValueError("CoDel needs 0 < target < interval")
+    self.target           = target   # acceptable standing sojourn time in ticks
+    self.interval         = interval # how long sojourn times may stay above target
+    self.first_above_time = 0        # when sojourn times will have been above target for interval, 0 if they aren't
+    self.dropping         = False    # in the dropping state?
+    self.drop_next        = 0        # when to drop next in the dropping state
+    self.count            = 0        # drops since entering the dropping state
+    self.lastcount        = 0        # count when the dropping state was last entered
+    self.num_unshiftable  = 0        # gaps between drops a hair above a whole tick, see deadlines.py
+  def enqueue(self, link, pkt, tick):
+    return True                  # CoDel only drops at the head
+  def control_law(self, t):
+    gap = self.interval / math.sqrt(self.count)
+    if (hair_above_tick(gap)):   # drop_next is compared against ticks
+      self.num_unshiftable += 1
+    return t + gap
+  def do_dequeue(self, link, tick):
+    """
+    Dequeue the head packet and return (packet, whether CoDel may drop it)
+    """
+    if (len(link.link_queue) == 0):
+      self.first_above_time = 0
+      return (None, False)
+    pkt = link.link_queue.popleft()
+    if (tick - pkt.enqueue_tick < self.target or len(link.link_queue) == 0):
+      self.first_above_time = 0
+      return (pkt, False)
+    if (self.first_above_time == 0):
+      self.first_above_time = tick + self.interval
+      return (pkt, False)
+    return (pkt, tick >= self.first_above_time)
+  def dequeue(self, link, tick):
+    pkt, ok_to_drop = self.do_dequeue(link, tick)
+    if (pkt is None):
+      self.dropping = False
+      return None
+    if (self.dropping):
+      if (not ok_to_drop):
+        self.dropping = False    # sojourn time is back below target
+      while (self.dropping and tick >= self.drop_next):
+        link.drop(pkt, tick, "aqm")
+        self.count += 1
+        pkt, ok_to_drop = self.do_dequeue(link, tick)
+        if (not ok_to_drop):
+          self.dropping = False
+        else:
+          self.drop_next = self.control_law(self.drop_next)
+    elif (ok_to_drop):
+      link.drop(pkt, tick, "aqm")
+      pkt, ok_to_drop = self.do_dequeue(link, tick)
+      self.dropping = True
+      # Resume at about the last drop rate if the last dropping state was recent
+      delta = self.count - self.lastcount
+      self.count = 1
+      if (delta > 1 and tick - self.drop_next < 16 * self.interval):
+        self.count = delta
+      self.drop_next = self.control_law(tick)
+      self.lastcount = self.count
+    return pkt
+  def state_signature(self, tick):
+    # first_above_time only matters while it is set, drop_next only within 16 intervals.
+    # The next drop_next is computed from drop_next, so its fraction matters as well.
+    first_above = self.first_above_time - tick if self.first_above_time != 0 else None
+    deadline_signature(self.drop_next, tick) # raises if drop_next can't be shifted safely
+    return (first_above, self.dropping, max(self.drop_next - tick, -16 * self.interval),
+            self.count, self.lastcount, self.num_unshiftable)
+  def shift(self, ticks):
+    if (self.first_above_time != 0):
+      self.first_above_time += ticks
+    self.drop_next += ticks
+
+def parse_qdisc(spec, seed):
+  """
+  Build a queue discipline from a --qdisc spec:
+
+    droptail                              DropTail()
+    red[:MIN_TH,MAX_TH[,MAX_P[,W_Q]]]     RED, default thresholds 5 and 15 packets
+    codel[:TARGET,INTERVAL]               CoDel, default 5 and 100 ticks
+
+  RED gets its own random.Random seeded with seed.
+  """
+  name, _, params = spec.partition(":")
+  values = [float(v) for v in params.split(",")] if params != "" else []
+  if (name == "droptail" and len(values) == 0):
+    return DropTail()
+  elif (name == "red" and len(values) in [0, 2, 3, 4]):
+    if (len(values) == 0):
+      values = [5, 15]
+    return RED(*values, seed = seed)
+  elif (name == "codel" and len(values) in [0, 2]):
+    return CoDel(*values)
+  raise ValueError("Invalid qdisc " + spec + ", must be droptail, red[:MIN_TH,MAX_TH[,MAX_P[,W_Q]]] or codel[:TARGET,INTERVAL]")
+
+def sojourn_summary(sojourn):
+  """
+  Count, mean, median, 99th percentile and max. of a Counter of sojourn times
+  (ticks -> number of packets), as a dict
+  """
+  count = sum(sojourn.values())
+  if (count == 0):
+    return {"count": 0, "mean": 0.0, "p50": 0, "p99": 0, "max": 0}
+  summary = {"count": count, "mean": sum(t * n for (t, n) in sojourn.items()) / count}
+  seen = 0
+  for t in sorted(sojourn):
+    seen += sojourn[t]
+    for (name, q) in [("p50", 0.5), ("p99", 0.99)]:
+      if (name not in summary and seen >= q * count):
+        summary[name] = t
+  summary["max"] = max(sojourn)
+  return summary
@@ -0,0 +1,88 @@
+class ReceiveWindow:
+  """
+  The receiver's view of which sequence numbers have arrived, for computing the
+  true cumulative (in order) sequence number under loss and reordering.
+
+  Data members of this class include:
+  base: Lowest sequence number that has not been received yet, so base - 1 is the
+        largest sequence number received in order
+  bits: bytearray with one byte per sequence number from base on, 1 if received
+  start: Index in bits of base; the bytes before it have been passed and are
+         dropped when they make up half of bits
+
+  Marking a sequence number is amortised O(1): advancing base over a run of received
+  sequence numbers is a single bytearray.find(), and only sequence numbers between
+  base and the highest one received out of order are stored, i.e., at most about a
+  window's worth.
+  """
+  def __init__(self, initial_size=64):
+    self.base  = 0               # lowest sequence number not received yet
+    self.bits  = bytearray(initial_size) # received flags, bits[start] is for base
+    self.start = 0               # index of base in bits
+
+  def mark(self, seq_num):
+    """
+    Record the arrival of seq_num and advance base over everything now received in
+    order. Returns False if seq_num had already been received (a duplicate).
+    """
+    if (seq_num < self.base):
+      return False
+    index = self.start + (seq_num - self.base)
+    if (index >= len(self.bits)):
+      self.compact()
+      index = seq_num - self.base
+      if (index >= len(self.bits)):
+        self.bits.extend(bytearray(max(index + 1, 2 * len(self.bits)) - len(self.bits)))
+    if (self.bits[index]):
+      return False
+    self.bits[index] = 1
+    if (index == self.start):
+      end = self.bits.find(0, index) # first sequence number still missing
+      if (end == -1):
+        end = len(self.bits)
+      self.base += end - self.start
+      self.start = end
+      if (2 * self.start >= len(self.bits)):
+        self.compact()
+    return True
+
+  def compact(self):             # drop the bytes of sequence numbers before base
+    del self.bits[:self.start]
+    self.start = 0
+
+  def in_order_rx_seq(self):     # largest sequence number received in order
+    return self.base - 1
+
+  def sack_blocks(self, max_blocks=None):
+    """
+    Ranges of sequence numbers received above base, as SACK-style
+    (first, last + 1) pairs in increasing order, at most max_blocks of them
+    """
+    blocks = []
+    index = self.start
+    while (max_blocks is None or len(blocks) < max_blocks):
+      first = self.bits.find(1, index)
+      if (first == -1):
+        break
+      end = self.bits.find(0, first)
+      if (end == -1):
+        end = len(self.bits)
+      blocks.append((self.base + first - self.start, self.base + end - self.start))
+      index = end
+    return blocks
+
+  def state_signature(self, base):
+    """
+    The out-of-order blocks with sequence numbers relative to base, for steady-state
+    detection; self.base itself is the host's in_order_rx_seq + 1
+    """
+    return tuple((first - base, end - base) for (first, end) in self.sack_blocks())
+
+  def shift(self, seqs):         # move everything seqs sequence numbers up
+    self.base += seqs
+
+  def __contains__(self, seq_num): # has seq_num been received?
+    if (seq_num < self.base):
+      return True
+    index = self.start + (seq_num - self.base)
+    return index < len(self.bits) and self.bits[index] == 1
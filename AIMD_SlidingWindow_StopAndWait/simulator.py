@@ -26,15 +26,40 @@ tick is the variable you should be using. You don't need to create your own
 version of time.
 """
 
+import os
 from network import *
+from engine import *
+from checkpoint import *
 import sys
 import argparse
 from stop_and_wait_host  import *
 from sliding_window_host import *
 from aimd_host import *
-from aimd_host import window_size, tick_number
-import matplotlib.pyplot as plt
+from metrics import *
+from loss_models import *
+from queue_disciplines import *
+from pacing import *
 
+# simlog lives at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import simlog
+
+
+# Arguments that define the simulated scenario. A run can only be resumed
+# from a checkpoint taken with the same values.
+SCENARIO_ARGS = ["seed", "host_type", "rtt_min", "loss_ratio", "queue_limit", "window_size", "link_capacity", "jitter", "loss_model", "cc", "qdisc", "pacing", "pacing_gain"]
+
+# Check that engine is one of two strings
+def check_engine(engine):
+  if (engine not in ["tick", "event"]):
+    raise argparse.ArgumentTypeError("Invalid engine, must be tick or event")
+  return engine
+
+# Check that cc names one of the congestion controllers
+def check_cc(cc):
+  if (cc not in CONGESTION_CONTROLS):
+    raise argparse.ArgumentTypeError("Invalid cc, must be one of " + ", ".join(CONGESTION_CONTROLS))
+  return cc
 
 # Check that host_type is one of three strings
 def check_host_type(host_type):
@@ -44,7 +69,7 @@ def check_host_type(host_type):
 
 if __name__ == '__main__':
     # Usage for command line arguments
-    parser = argparse.ArgumentParser(description='Assignment 2 simulator. Link capacity is always 1 packet per tick')
+    parser = argparse.ArgumentParser(description='Assignment 2 simulator. Link capacity defaults to 1 packet per tick')
     optional = parser._action_groups.pop()
 
     # required arguments
@@ -56,62 +81,137 @@ if __name__ == '__main__':
 
     # optional arguments
     optional.add_argument('--loss_ratio', dest='loss_ratio', type=float, help='indepenendent and identically distributed loss probability, default 0', default=0.0)
+    optional.add_argument('--loss_model', dest='loss_model', type=str, help='"bernoulli" (with --loss_ratio), "gilbert:P_GB,P_BG[,LOSS_GOOD,LOSS_BAD]" for bursty loss or "trace:FILE" to replay a 0/1 loss trace; decisions come from a NumPy generator seeded with --seed. Default: i.i.d. loss_ratio')
     optional.add_argument('--queue_limit', dest='queue_limit', type=int, help='max. queue size of link queue, defaults to 1M packets, which is practically infinite', default=1000000)
+    optional.add_argument('--qdisc', dest='qdisc', type=str, help='queue discipline of the link: "droptail", "red[:MIN_TH,MAX_TH[,MAX_P[,W_Q]]]" or "codel[:TARGET,INTERVAL]" (thresholds in packets, times in ticks); prints sojourn time and drop statistics at the end. Default droptail')
     optional.add_argument('--window_size', dest='window_size', type=int, help='Window size in packets for sliding window sender')
+    optional.add_argument('--cc', dest='cc', type=check_cc, help='congestion control for host_type Aimd: aimd (slow start and AIMD on timeouts), reno, newreno or cubic; default aimd')
+    optional.add_argument('--pacing', dest='pacing', action='store_true', help='for host_type SlidingWindow and Aimd: spread new packets evenly over the smoothed RTT instead of sending the window in one burst; prints drop rate and goodput at the end')
+    optional.add_argument('--pacing_gain', dest='pacing_gain', type=float, help='with --pacing, send at this multiple of window / RTT, default 1.2', default=1.2)
+    optional.add_argument('--link_capacity', dest='link_capacity', type=int, help='link capacity in packets per tick, default 1', default=1)
+    optional.add_argument('--jitter', dest='jitter', type=int, help='max. random extra delay in ticks added to each packet on top of rtt_min, reorders packets, default 0', default=0)
+    optional.add_argument('--engine', dest='engine', type=check_engine, help='"tick" runs every tick, "event" skips ticks on which nothing happens; both give the same results, default tick', default="tick")
+    optional.add_argument('--fast_forward', dest='fast_forward', action='store_true', help='detect when a run without loss and jitter becomes periodic and skip whole periods; same results, ignored with --metrics')
+    optional.add_argument('--metrics', dest='metrics', type=str, help='directory to stream window, RTT, timeout, queue depth and goodput time series to')
+    optional.add_argument('--metrics_decimation', dest='metrics_decimation', type=int, help='ticks per recorded metrics row, default 1', default=1)
+    optional.add_argument('--metrics_mode', dest='metrics_mode', type=str, help='"sample" records the last value of each block of ticks, "minmax" the min. and max., default sample', default="sample")
+    optional.add_argument('--checkpoint', dest='checkpoint', type=str, help='file to periodically save a snapshot of the simulation to')
+    optional.add_argument('--checkpoint_interval', dest='checkpoint_interval', type=int, help='ticks between snapshots, default 1000000', default=1000000)
+    optional.add_argument('--resume', dest='resume', type=str, help='continue the run from this snapshot; the scenario arguments must match the ones it was taken with')
+    simlog.add_arguments(optional)
     parser._action_groups.append(optional)
 
     # Actually carry out parsing
     args=parser.parse_args()
 
     print(args)
-
-    # Initialize the random seed so that it is deterministic
-    random.seed(args.seed)
-
-    # Construct the different elements
-
-    # The network link connecting sender to the receiver
-    # In the simulation, the sender and receiver are really the same object (host),
-    # and correspond to the send() and recv() methods
-    link = Link(loss_ratio = args.loss_ratio, queue_limit = args.queue_limit)
-
-    # Create the host based on the host_type, i.e., what protocol the host follows
-    if (args.host_type == "StopAndWait"):
-      host = StopAndWaitHost()
-    elif (args.host_type == "SlidingWindow"):
-      if (args.window_size is None):
-        raise argparse.ArgumentTypeError("window_size must be defined for host_type SlidingWindow")
-      else:
-        host = SlidingWindowHost(args.window_size)
-    elif (args.host_type == "Aimd"):
-      host = AimdHost()
+    simlog.configure(args.log, args.trace_buffer)
+
+    scenario = dict((name, getattr(args, name)) for name in SCENARIO_ARGS)
+    if (args.resume is not None):
+      # Pick up the simulation, including the random state, where the snapshot left off
+      sim, saved_scenario = load_checkpoint(args.resume)
+      if (saved_scenario != scenario):
+        raise argparse.ArgumentTypeError("Scenario arguments " + str(scenario) + " don't match the ones the checkpoint was taken with: " + str(saved_scenario))
+      host = sim.host
+      if (sim.metrics is not None):
+        sim.metrics.truncate_to_checkpoint()
+      print("Resuming from tick " + str(sim.tick))
     else:
-      assert(False)
-
-    # Create a box representing the two-way propagation delay
-    # , i.e., the minimum round-trip time
-    if (args.rtt_min < 2):
-      raise argparse.ArgumentTypeError("rtt_min must be at least 2")
-    pdbox = PropDelayBox(args.rtt_min - 1)
-
-    # Run the simulation for the specified number of ticks,
-    # by running the host, then the link, then the pdbox
-    for tick in range(0, args.ticks):
-      packets = host.send(tick)
+      # Initialize the random seed so that it is deterministic
+      random.seed(args.seed)
+
+      # Construct the different elements
+
+      # The network link connecting sender to the receiver
+      # In the simulation, the sender and receiver are really the same object (host),
+      # and correspond to the send() and recv() methods
+      if (args.link_capacity < 1):
+        raise argparse.ArgumentTypeError("link_capacity must be at least 1")
+      loss_model = None
+      if (args.loss_model is not None):
+        try:
+          loss_model = parse_loss_model(args.loss_model, args.loss_ratio, args.seed)
+        except ValueError as e:
+          raise argparse.ArgumentTypeError(str(e))
+      qdisc = None
+      if (args.qdisc is not None):
+        try:
+          qdisc = parse_qdisc(args.qdisc, args.seed)
+        except ValueError as e:
+          raise argparse.ArgumentTypeError(str(e))
+      link = Link(loss_ratio = args.loss_ratio, queue_limit = args.queue_limit, capacity = args.link_capacity, loss_model = loss_model, qdisc = qdisc)
+
+      # Create the host based on the host_type, i.e., what protocol the host follows
+      if (args.cc is not None and args.host_type != "Aimd"):
+        raise argparse.ArgumentTypeError("cc only applies to host_type Aimd")
+      if (args.pacing and args.host_type == "StopAndWait"):
+        raise argparse.ArgumentTypeError("pacing only applies to host_type SlidingWindow and Aimd")
+      if (args.pacing_gain <= 0):
+        raise argparse.ArgumentTypeError("pacing_gain must be positive")
+      # Until the first ACK, pace as if a handshake had measured rtt_min
+      pacer = Pacer(args.pacing_gain, initial_rtt = args.rtt_min) if args.pacing else None
+      if (args.host_type == "StopAndWait"):
+        host = StopAndWaitHost()
+      elif (args.host_type == "SlidingWindow"):
+        if (args.window_size is None):
+          raise argparse.ArgumentTypeError("window_size must be defined for host_type SlidingWindow")
+        else:
+          host = SlidingWindowHost(args.window_size, pacer)
+      elif (args.host_type == "Aimd"):
+        host = AimdHost(CONGESTION_CONTROLS[args.cc or "aimd"](), pacer)
+      else:
+        assert(False)
 
-      if packets is not None:
-          # If a single packet is received, convert it to list
-          if type(packets) is Packet:
-              packets = [packets]
+      # Create a box representing the two-way propagation delay
+      # , i.e., the minimum round-trip time
+      if (args.rtt_min < 2):
+        raise argparse.ArgumentTypeError("rtt_min must be at least 2")
+      pdbox = PropDelayBox(args.rtt_min - 1, jitter = args.jitter)
 
-          # Transmit the packets received from the host
-          for packet in packets:
-              link.recv(packet)
+      sim = Simulation(host, link, pdbox)
+      if (args.metrics is not None):
+        sim.metrics = MetricsRecorder(args.metrics, decimation = args.metrics_decimation, mode = args.metrics_mode)
 
-      link.tick(tick, pdbox)
-      pdbox.tick(tick, host)
+    # Run the simulation for the specified number of ticks,
+    # by running the host, then the link, then the pdbox.
+    # With --checkpoint, stop every checkpoint_interval ticks to save a snapshot.
+    if (args.checkpoint_interval < 1):
+      raise argparse.ArgumentTypeError("checkpoint_interval must be at least 1")
+    skipped = 0
+    while (sim.tick < args.ticks):
+      end_tick = args.ticks
+      if (args.checkpoint is not None):
+        end_tick = min(args.ticks, (sim.tick // args.checkpoint_interval + 1) * args.checkpoint_interval)
+      if (args.fast_forward):
+        skipped += sim.run_fast_forward(end_tick, engine = args.engine)
+      elif (args.engine == "event"):
+        sim.run_events(end_tick)
+      else:
+        sim.run(end_tick)
+      if (args.checkpoint is not None):
+        save_checkpoint(args.checkpoint, sim, scenario)
+
+    if (sim.metrics is not None):
+      sim.metrics.close()
+    if (args.qdisc is not None):
+      # How long packets queued, and what the link gave up for it
+      link = sim.link
+      sojourn = sojourn_summary(link.sojourn)
+      print("Queue discipline " + args.qdisc + ": sojourn time mean %.2f, median %d, 99th percentile %d, max. %d ticks" %
+            (sojourn["mean"], sojourn["p50"], sojourn["p99"], sojourn["max"]))
+      print("Drops: %d at queue_limit, %d by the queue discipline, %d lost on the link; utilisation %.4f" %
+            (link.drops["queue_limit"], link.drops["aqm"], link.drops["loss"],
+             link.num_transmitted / (args.ticks * link.capacity)))
+    if (args.pacing):
+      # What smoothing the bursts did to losses and goodput
+      num_sent = sim.num_original + sim.num_retransmitted
+      num_dropped = sum(sim.link.drops.values())
+      print("Sent %d packets (%d retransmissions), %d dropped (drop rate %.4f); goodput %.4f packets/tick" %
+            (num_sent, sim.num_retransmitted, num_dropped, num_dropped / max(num_sent, 1),
+             (host.in_order_rx_seq + 1) / args.ticks))
+    if (args.fast_forward):
+      print("Fast-forwarded " + str(skipped) + " of " + str(args.ticks) + " ticks")
 
     # Report the largest sequence number that has been received in order
     print("Maximum in order received sequence number " + str(host.in_order_rx_seq))
-    # plt.plot(tick_number, window_size)
-    # plt.show()
@@ -1,6 +1,12 @@
 import sys
+import math
+import logging
 from packet import *
 from timeout_calculator import *
+from unacked_table import *
+from receive_window import *
+
+log = logging.getLogger("sim.host")
 
 class UnackedPacket:
   """
@@ -24,13 +30,17 @@ class UnackedPacket:
 class SlidingWindowHost:
   """
   This host follows the SlidingWindow protocol. It maintains a window size and the
-  list of unacked packets. The algorithm itself is documented with the send method
+  list of unacked packets. The algorithm itself is documented with the send method.
+  With a pacer (see pacing.py), new packets are spread over the RTT instead of
+  filling the window at once.
   """
-  def __init__(self, window_size):
-    self.unacked = []           # list of unacked packets
+  def __init__(self, window_size, pacer=None):
+    self.pacer = pacer          # optional pacing.Pacer that spaces out new packets
+    self.unacked = UnackedTable() # unacked packets, indexed by seq_num and by timeout_tick
     self.window = window_size   # window size
     self.max_seq = -1           # maximum sequence number sent so far
     self.in_order_rx_seq = -1   # maximum sequence number received so far in order
+    self.rx_window = ReceiveWindow() # which sequence numbers the receiver has seen
     self.timeout_calculator = TimeoutCalculator()  # object for computing timeouts
 
   def send(self, tick):
@@ -51,46 +61,84 @@ class SlidingWindowHost:
     packets = []
 
     # First, process retransmissions
-    for i in range(0, len(self.unacked)):
-      unacked_pkt = self.unacked[i]
-      if tick >= self.unacked[i].timeout_tick:
-        # Retransmit any packet that has timed out
-        # by doing the following in order
-        # (1) creating a new packet,
-        packet = Packet(tick, unacked_pkt.seq_num)
-        # (2) setting its retx attribute to True (just for debugging)
-        packet.retx = True
-        # (3) Append the packet to the list of packets created earlier
-        packets.append(packet)
-        # (4) Backing off the timer
-        self.timeout_calculator.exp_backoff()
-        # (5) Updating timeout_tick and timeout_duration appropriately after backing off the timer
-        unacked_pkt.timeout_duration = self.timeout_calculator.timeout
-        unacked_pkt.timeout_tick = tick + unacked_pkt.timeout_duration
-        # (6) Updating num_retx
-        unacked_pkt.num_retx += 1
-      self.unacked[i] = unacked_pkt
+    for unacked_pkt in self.unacked.expired(tick):
+      # Retransmit any packet that has timed out
+      # by doing the following in order
+      # (1) creating a new packet,
+      packet = packet_pool.alloc(tick, unacked_pkt.seq_num)
+      # (2) setting its retx attribute to True (just for debugging)
+      packet.retx = True
+      # (3) Append the packet to the list of packets created earlier
+      packets.append(packet)
+      # (4) Backing off the timer
+      self.timeout_calculator.exp_backoff()
+      # (5) Updating timeout_tick and timeout_duration appropriately after backing off the timer
+      unacked_pkt.timeout_duration = self.timeout_calculator.timeout
+      unacked_pkt.timeout_tick = tick + unacked_pkt.timeout_duration
+      self.unacked.rearm(unacked_pkt)
+      # (6) Updating num_retx
+      unacked_pkt.num_retx += 1
 
     assert(len(self.unacked) <= self.window)
 
     # Now fill up the window with new packets
-    while (len(self.unacked) < self.window):
+    while (len(self.unacked) < self.window and (self.pacer is None or self.pacer.can_send(tick))):
       # Create new packets, set their retransmission timeout, and add them to the list
-      packet = Packet(tick, self.max_seq+1)
+      packet = packet_pool.alloc(tick, self.max_seq+1)
       unacked_packet = UnackedPacket(packet.seq_num)
       unacked_packet.timeout_duration = self.timeout_calculator.timeout
       unacked_packet.timeout_tick = self.timeout_calculator.timeout + tick
       packets.append(packet)
       # Remember to update self.max_seq and add then just sent packet to self.unacked
       self.max_seq += 1
-      self.unacked.append(unacked_packet)
-      print("send packet @", tick, "with sequence number ", self.max_seq)
-    # window must be filled up at this point
-    assert(len(self.unacked) == self.window)
+      self.unacked.add(unacked_packet)
+      log.debug("send packet @ %d with sequence number %d", tick, self.max_seq)
+      if (self.pacer is not None):
+        self.pacer.on_send(tick, self)
+    # window must be filled up at this point, unless pacing holds packets back
+    assert(len(self.unacked) == self.window or self.pacer is not None)
 
     # return the list of packets that need to be transmitted on to the network
     return packets
 
+  def next_send_tick(self, tick):
+    """
+    Earliest tick >= tick at which send() has something to do: right away if the
+    window has room for new packets, otherwise when the first unacked packet times out.
+    With pacing, new packets wait for the pacer, and a timeout can come first.
+    """
+    candidates = []
+    if (len(self.unacked) < self.window):
+      if (self.pacer is None):
+        return tick
+      candidates.append(self.pacer.next_send_tick(tick))
+    next_timeout_tick = self.unacked.next_timeout_tick()
+    if (next_timeout_tick is not None):
+      candidates.append(math.ceil(next_timeout_tick))
+    if (len(candidates) == 0):
+      return None
+    return max(tick, min(candidates))
+
+  def state_signature(self, tick, base):
+    """
+    Hashable summary of everything that determines what this host does from tick
+    on, with ticks relative to tick and sequence numbers relative to base
+    """
+    return (self.window, self.rx_window.state_signature(base), self.max_seq - base, self.in_order_rx_seq - base,
+            self.timeout_calculator.state_signature(), self.unacked.state_signature(tick, base),
+            self.pacer.state_signature(tick) if self.pacer is not None else None)
+
+  def shift(self, ticks, seqs):
+    """
+    Move the host's state ticks into the future and seqs sequence numbers up
+    """
+    if (self.pacer is not None):
+      self.pacer.shift(ticks)
+    self.max_seq         += seqs
+    self.in_order_rx_seq += seqs
+    self.rx_window.shift(seqs)
+    self.unacked.shift(ticks, seqs)
+
   def recv(self, pkt, tick):
     """
     Function to get a packet from the network.
@@ -110,21 +158,11 @@ class SlidingWindowHost:
     self.timeout_calculator.update_timeout(RTT)
 
     #  Remove received packet from self.unacked
-    # for p in self.unacked:
-    #   if p.seq_num == pkt.seq_num:
-    #     self.unacked.remove(p)
-    for i in range(len(self.unacked)):
-      if self.unacked[i].seq_num == pkt.seq_num:
-        del self.unacked[i]
-        break
-
-    #  Update in_order_rx_seq to reflect the largest sequence number that you have received in order so far
-    # if not self.unacked:
-    #     self.in_order_rx_seq = self.max_seq
-    # else:
-    #     self.in_order_rx_seq = self.unacked[0].seq_num - 1
-
-    self.in_order_rx_seq = max(self.in_order_rx_seq, pkt.seq_num)
-    # self.in_order_rx_seq = max(self.in_order_rx_seq, pkt.seq_num)
+    self.unacked.remove(pkt.seq_num)
+
+    #  Update in_order_rx_seq to reflect the largest sequence number that you have received in order so far,
+    #  which only moves past a lost or reordered packet once that packet arrives
+    self.rx_window.mark(pkt.seq_num)
+    self.in_order_rx_seq = self.rx_window.in_order_rx_seq()
 
     assert(len(self.unacked) <= self.window)
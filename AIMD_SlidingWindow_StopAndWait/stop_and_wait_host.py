@@ -1,6 +1,10 @@
+import math
+import logging
 from packet import *
 from timeout_calculator import *  # Import timeout calculator for StopAndWait
 
+log = logging.getLogger("sim.host")
+
 class StopAndWaitHost:
   """
   This host implements the stop and wait protocol. Here the host only
@@ -19,21 +23,20 @@ class StopAndWaitHost:
 
     if (self.ready_to_send):
       # Send next sequence number by creating a packet
-      packet = Packet(tick, self.in_order_rx_seq)
+      packet = packet_pool.alloc(tick, self.in_order_rx_seq)
 
       # Remember to update packet_sent_time and ready_to_send appropriately
       self.packet_sent_time = tick
       self.ready_to_send = False
 
       # Return the packet
-      sequence_number = packet.seq_num
-      print("sent packet @", tick, "with sequence number ", sequence_number+1)
+      log.debug("sent packet @ %d with sequence number %d", tick, packet.seq_num + 1)
       return packet
 
     elif (tick - self.packet_sent_time >= self.timeout_calculator.timeout):
       # Timeout has been exceeded, retransmit packet
       # following the same procedure as above when transmitting a packet for the first time
-      packet = Packet(tick, self.in_order_rx_seq + 1)
+      packet = packet_pool.alloc(tick, self.in_order_rx_seq + 1)
 
       # Exponentially back off the timer
       self.timeout_calculator.exp_backoff()
@@ -42,9 +45,34 @@ class StopAndWaitHost:
       packet.retx = True
 
       # Return the packet
-      print("Retransmission sent packet @ ", tick, " with sequence number ", packet.seq_num)
+      log.debug("Retransmission sent packet @ %d with sequence number %d", tick, packet.seq_num)
       return packet
 
+  def next_send_tick(self, tick):
+    """
+    Earliest tick >= tick at which send() has something to do: right away if we
+    are ready to send, otherwise when the retransmission timeout expires.
+    """
+    if (self.ready_to_send):
+      return tick
+    return max(tick, math.ceil(self.packet_sent_time + self.timeout_calculator.timeout))
+
+  def state_signature(self, tick, base):
+    """
+    Hashable summary of everything that determines what this host does from tick
+    on, with ticks relative to tick and sequence numbers relative to base
+    """
+    # packet_sent_time only matters while waiting for an ACK
+    sent = None if self.ready_to_send else self.packet_sent_time - tick
+    return (self.ready_to_send, sent, self.in_order_rx_seq - base, self.timeout_calculator.state_signature())
+
+  def shift(self, ticks, seqs):
+    """
+    Move the host's state ticks into the future and seqs sequence numbers up
+    """
+    self.packet_sent_time += ticks
+    self.in_order_rx_seq  += seqs
+
   def recv(self, pkt, tick):
     """
     Function to get a packet from the network.
@@ -61,8 +89,8 @@ class StopAndWaitHost:
 
     # Update timeout based on RTT sample
     self.timeout_calculator.update_timeout(RTT)
-    print("@", tick, "timeout computed to be ", self.timeout_calculator.timeout)
-    print("rx packet @", tick, "with sequence number ", self.in_order_rx_seq+1)
+    log.debug("@ %d timeout computed to be %s", tick, self.timeout_calculator.timeout)
+    log.debug("rx packet @ %d with sequence number %d", tick, self.in_order_rx_seq + 1)
     # Update self.in_order_rx_seq and self.ready_to_send depending on pkt.seq_num
     if pkt.seq_num == self.in_order_rx_seq:
       self.ready_to_send = True
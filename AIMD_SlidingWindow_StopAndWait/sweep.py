@@ -0,0 +1,169 @@
+"""
+Parallel, resumable parameter sweeps over the transport simulator.
+
+A sweep is a list of points. Each point is a dict with the keys in POINT_KEYS and
+describes one simulation run. Points are spread across a pool of worker processes,
+and each run is reduced to a handful of summary metrics (see run_point) so that
+memory does not grow with the number of ticks.
+
+Results are appended to a JSON lines file as soon as each point finishes. If a sweep
+is interrupted, running it again with the same output file skips the points that
+are already in the file and only runs the rest.
+
+Example: the window size sweep that plotter.py runs, on 8 processes
+
+python3 sweep.py --host_type SlidingWindow --windows 2:400 --rtt_min 11 --ticks 100000 --output windows.jsonl --processes 8
+"""
+
+import argparse
+import json
+import os
+import random
+from multiprocessing import Pool
+from network import *
+from engine import *
+from stop_and_wait_host import *
+from sliding_window_host import *
+from aimd_host import *
+from queue_disciplines import *
+from pacing import *
+
+# Parameters that identify a point in the sweep
+POINT_KEYS = ["host_type", "window", "seed", "rtt_min", "loss_ratio", "queue_limit", "ticks", "engine", "cc", "qdisc", "pacing"]
+
+def make_point(host_type, window, seed, rtt_min, loss_ratio, queue_limit, ticks, engine = "event", cc = None, qdisc = None, pacing = None):
+  if (host_type != "SlidingWindow"):
+    window = None                # StopAndWait and Aimd pick their own window
+  if (host_type != "Aimd"):
+    cc = None                    # only Aimd has a congestion controller
+  elif (cc is None):
+    cc = "aimd"
+  elif (cc not in CONGESTION_CONTROLS):
+    raise ValueError("Invalid cc " + str(cc) + ", must be one of " + ", ".join(CONGESTION_CONTROLS))
+  if (qdisc is not None):
+    parse_qdisc(qdisc, seed)     # raises ValueError if it is invalid; None is drop-tail
+  if (host_type == "StopAndWait"):
+    pacing = None                # one packet at a time needs no pacing
+  elif (pacing is not None and pacing <= 0):
+    raise ValueError("pacing gain must be positive")
+  return {"host_type": host_type, "window": window, "seed": seed, "rtt_min": rtt_min,
+          "loss_ratio": loss_ratio, "queue_limit": queue_limit, "ticks": ticks, "engine": engine, "cc": cc,
+          "qdisc": qdisc, "pacing": pacing}
+
+def point_key(point):
+  """
+  Hashable identity of a point, used to recognize points that already ran
+  """
+  # Results written before a key was added don't have it
+  return json.dumps([point.get(k) for k in POINT_KEYS])
+
+def run_point(point):
+  """
+  Run the simulation described by point and return its summary metrics
+  """
+  random.seed(point["seed"])
+  # Pacing gain, or None for no pacing; pace the first RTT as if a handshake had measured rtt_min
+  pacer = Pacer(point["pacing"], initial_rtt = point["rtt_min"]) if point.get("pacing") is not None else None
+  if (point["host_type"] == "StopAndWait"):
+    host = StopAndWaitHost()
+  elif (point["host_type"] == "SlidingWindow"):
+    host = SlidingWindowHost(point["window"], pacer)
+  elif (point["host_type"] == "Aimd"):
+    host = AimdHost(CONGESTION_CONTROLS[point.get("cc") or "aimd"](), pacer)
+  else:
+    raise ValueError("Invalid host_type " + str(point["host_type"]) + ", must be StopAndWait, SlidingWindow or Aimd")
+  qdisc = parse_qdisc(point["qdisc"], point["seed"]) if point.get("qdisc") is not None else None
+  link  = Link(loss_ratio = point["loss_ratio"], queue_limit = point["queue_limit"], qdisc = qdisc)
+  pdbox = PropDelayBox(point["rtt_min"] - 1)
+  sim   = Simulation(host, link, pdbox)
+  if (point["engine"] == "event"):
+    sim.run_events(point["ticks"])
+  else:
+    sim.run(point["ticks"])
+
+  result = dict(point)
+  result["in_order_rx_seq"]   = host.in_order_rx_seq
+  result["throughput"]        = (host.in_order_rx_seq + 1) / point["ticks"]
+  result["num_original"]      = sim.num_original
+  result["num_retransmitted"] = sim.num_retransmitted
+  result["mean_rtt"]          = host.timeout_calculator.mean_rtt # smoothed RTT at the end, rtt_min plus queueing
+  sojourn = sojourn_summary(link.sojourn)
+  result["mean_sojourn"]      = sojourn["mean"] # ticks transmitted packets spent in the link queue
+  result["p99_sojourn"]       = sojourn["p99"]
+  result["num_aqm_drops"]     = link.drops["aqm"]
+  result["utilisation"]       = link.num_transmitted / point["ticks"]
+  result["num_dropped"]       = sum(link.drops.values()) # at the queue limit, by the qdisc and on the link
+  result["drop_rate"]         = result["num_dropped"] / max(sim.num_original + sim.num_retransmitted, 1)
+  return result
+
+def load_results(path):
+  """
+  Read the results already written to path. A partially written last line,
+  left behind by an interrupted sweep, is cut off so that appending can resume.
+  """
+  if (not os.path.exists(path)):
+    return []
+  with open(path, "r+") as fh:
+    contents = fh.read()
+    if (contents != "" and not contents.endswith("\n")):
+      contents = contents[:contents.rfind("\n") + 1]
+      fh.seek(0)
+      fh.truncate()
+      fh.write(contents)
+  return [json.loads(line) for line in contents.splitlines() if line.strip() != ""]
+
+def run_sweep(points, path, processes = None):
+  """
+  Run every point that is not yet in the results file at path, appending each
+  result as soon as it is available. Returns the results for all points.
+  """
+  results = load_results(path)
+  done = set(point_key(r) for r in results)
+  todo = [p for p in points if point_key(p) not in done]
+  if (len(todo) > 0):
+    with open(path, "a") as fh, Pool(processes) as pool:
+      for result in pool.imap_unordered(run_point, todo):
+        fh.write(json.dumps(result) + "\n")
+        fh.flush()
+        results.append(result)
+  wanted = set(point_key(p) for p in points)
+  return [r for r in results if point_key(r) in wanted]
+
+# Parse "2:400" as range(2, 400) and "1,2,5" as [1, 2, 5]
+def parse_values(spec, value_type):
+  if (":" in spec):
+    start, stop = spec.split(":")
+    return list(range(int(start), int(stop)))
+  return [value_type(v) for v in spec.split(",")]
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Run a parameter sweep of the simulator across a process pool. Lists are comma-separated; integer ranges can be given as start:stop.')
+  parser.add_argument('--host_type', dest='host_type', type=str, help='StopAndWait, SlidingWindow or Aimd', required=True)
+  parser.add_argument('--ticks', dest='ticks', type=int, help='Number of ticks to run each simulation for', required=True)
+  parser.add_argument('--output', dest='output', type=str, help='JSON lines file that results are appended to, and resumed from', required=True)
+  parser.add_argument('--windows', dest='windows', type=str, help='window sizes for SlidingWindow, default 10', default="10")
+  parser.add_argument('--seeds', dest='seeds', type=str, help='random seeds, default 1', default="1")
+  parser.add_argument('--rtt_min', dest='rtt_min', type=str, help='minimum round-trip times in ticks, default 10', default="10")
+  parser.add_argument('--loss_ratio', dest='loss_ratio', type=str, help='loss probabilities, default 0', default="0.0")
+  parser.add_argument('--queue_limit', dest='queue_limit', type=str, help='link queue limits, default 1000000', default="1000000")
+  parser.add_argument('--engine', dest='engine', type=str, help='tick or event, default event', default="event")
+  parser.add_argument('--cc', dest='cc', type=str, help='congestion controls for Aimd, e.g., aimd,reno,newreno,cubic, default aimd', default="aimd")
+  parser.add_argument('--qdisc', dest='qdisc', type=str, nargs='+', help='queue disciplines, space-separated since their parameters are comma-separated, e.g., droptail red codel:5,20; default drop-tail', default=[None])
+  parser.add_argument('--pacing', dest='pacing', type=str, help='pacing gains for SlidingWindow and Aimd, "none" for no pacing, e.g., none,1.2; default none', default="none")
+  parser.add_argument('--processes', dest='processes', type=int, help='number of worker processes, default one per CPU', default=None)
+  args = parser.parse_args()
+
+  points = []
+  windows = parse_values(args.windows, int) if args.host_type == "SlidingWindow" else [None]
+  for window in windows:
+    for seed in parse_values(args.seeds, int):
+      for rtt_min in parse_values(args.rtt_min, int):
+        for loss_ratio in parse_values(args.loss_ratio, float):
+          for queue_limit in parse_values(args.queue_limit, int):
+            for cc in (parse_values(args.cc, str) if args.host_type == "Aimd" else [None]):
+              for qdisc in args.qdisc:
+                for pacing in [None if g == "none" else float(g) for g in args.pacing.split(",")]:
+                  points.append(make_point(args.host_type, window, seed, rtt_min, loss_ratio, queue_limit, args.ticks, args.engine, cc, qdisc, pacing))
+
+  results = run_sweep(points, args.output, args.processes)
+  print("Sweep has " + str(len(results)) + " of " + str(len(points)) + " points in " + args.output)
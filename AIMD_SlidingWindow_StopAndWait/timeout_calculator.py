@@ -1,3 +1,8 @@
+import logging
+from deadlines import hair_above_tick, UnstableSignature
+
+log = logging.getLogger("sim.timeout")
+
 MIN_TIMEOUT = 100    # minimum possible timeout
 MAX_TIMEOUT = 10000  # maximum possible timeout
 
@@ -15,11 +20,14 @@ class TimeoutCalculator:
     #  Initialize the variable self.timeout to the minimum possible value
     self.timeout       = MIN_TIMEOUT
     self.ewma_init     = False       # EWMA is not initialized until the first sample is seen
+    self.rtt_sample    = 0.0         # most recent RTT sample, for metrics
+    self.num_unshiftable = 0         # timeouts a hair above a whole tick so far, see deadlines.py
 
   def update_timeout(self, rtt_sample):
     """
     This function is used to update the mean and variance RTTs
     """
+    self.rtt_sample = rtt_sample
     if (not self.ewma_init): # If you have seen no rtts yet or exponentially backed off before
       # Initialize mean_rtt to current sample
       self.mean_rtt = rtt_sample
@@ -37,13 +45,26 @@ class TimeoutCalculator:
       # Update mean rtt based on rtt_sample
       self.mean_rtt = self.mean_rtt * (1 - self.alpha) + self.alpha * rtt_sample
       # Update timeout based on mean rtt and rtt var
-      self.timeout = self.mean_rtt + 4 * self.rtt_var
+      self.timeout = self.mean_rtt + self.k * self.rtt_var
       if self.timeout > MAX_TIMEOUT:
         self.timeout = MAX_TIMEOUT
       elif self.timeout < MIN_TIMEOUT:
         self.timeout = MIN_TIMEOUT
+    self.note_timeout()          # hosts add it to the current tick
     return self.timeout
-    
+
+  def state_signature(self):
+    """
+    The state that determines future timeouts, for steady-state detection
+    """
+    if (hair_above_tick(self.timeout)):
+      raise UnstableSignature()  # see deadlines.py
+    return (self.mean_rtt, self.rtt_var, self.timeout, self.ewma_init, self.num_unshiftable)
+
+  def note_timeout(self):
+    if (hair_above_tick(self.timeout)):
+      self.num_unshiftable += 1
+
   def exp_backoff(self):
     """
     This function is used to double the timeout representing an exponential backoff
@@ -52,9 +73,92 @@ class TimeoutCalculator:
     self.timeout *= 2
     # Re-initialize the EWMA
     self.ewma_init = False
-    print ("exponential backoff here, re-initializing EWMA")
+    log.debug("exponential backoff to %s, re-initializing EWMA", self.timeout)
     if self.timeout > MAX_TIMEOUT:
       self.timeout = MAX_TIMEOUT
     elif self.timeout < MIN_TIMEOUT:
       self.timeout = MIN_TIMEOUT
+    self.note_timeout()
     return self.timeout
+
+def linear_recurrence(coeffs, offsets):
+  """
+  Solve y[..., i] = coeffs[..., i] * y[..., i-1] + offsets[..., i], with y[..., -1] = 0,
+  along the last axis of two NumPy arrays of the same shape. A coefficient of 0
+  restarts the recurrence at that sample's offset. Uses a doubling scan, i.e.,
+  log2(N) vectorised steps over the whole array instead of a loop over samples.
+  """
+  coeffs  = coeffs.copy()
+  offsets = offsets.copy()
+  shift = 1
+  while (shift < offsets.shape[-1]):
+    # Compose each step with the one shift samples before it
+    offsets[..., shift:] += coeffs[..., shift:] * offsets[..., :-shift]
+    coeffs[..., shift:]  *= coeffs[..., :-shift]
+    shift *= 2
+  return offsets
+
+def ewma_filter(samples, alpha, initial):
+  """
+  Vectorised EWMA along the last axis of samples:
+  y[i] = y[i-1] * (1 - alpha) + alpha * samples[i], with y[-1] = initial.
+  alpha and initial may be arrays that broadcast against samples[..., :1],
+  e.g., one column per row of a 2-D array of samples.
+  """
+  # Imported here so that the simulator itself does not depend on NumPy
+  import numpy
+  samples = numpy.asarray(samples, dtype = float)
+  alpha   = numpy.asarray(alpha, dtype = float)
+  coeffs  = numpy.broadcast_to(1.0 - alpha, samples.shape)
+  offsets = alpha * samples
+  offsets[..., :1] += (1.0 - alpha) * numpy.asarray(initial, dtype = float)
+  return linear_recurrence(coeffs, offsets)
+
+def batch_timeouts(rtt_samples, alpha = 0.125, beta = 0.25, k = 4.0, resets = None):
+  """
+  Batched version of TimeoutCalculator.update_timeout over a whole RTT trace.
+
+  Args:
+
+      **rtt_samples**: 1-D array of RTT samples, in the order they were taken
+
+      **alpha**, **beta**, **k**: Either scalars, or 1-D sequences of the same length S
+      to evaluate S settings at once; scalars are repeated across settings
+
+      **resets**: Optional boolean array, True for samples taken right after an
+      exp_backoff(), which re-initialize the EWMA. The first sample always does.
+
+  Returns:
+      (mean_rtt, rtt_var, timeout) after each sample, as arrays of shape (S, N), or (N,)
+      if alpha, beta and k are all scalars. Like update_timeout, the timeout is clamped
+      to [MIN_TIMEOUT, MAX_TIMEOUT] except on samples that initialize the EWMA.
+  """
+  import numpy
+
+  samples = numpy.asarray(rtt_samples, dtype = float)
+  scalar_settings = numpy.ndim(alpha) == 0 and numpy.ndim(beta) == 0 and numpy.ndim(k) == 0
+  alphas, betas, ks = numpy.broadcast_arrays(numpy.atleast_1d(alpha), numpy.atleast_1d(beta), numpy.atleast_1d(k))
+  # One row per setting, one column per sample
+  alphas, betas, ks = alphas[:, None], betas[:, None], ks[:, None]
+  shape = (len(alphas), len(samples))
+
+  # Samples that initialize the EWMA: mean_rtt = sample, rtt_var = sample/2, no clamping
+  init = numpy.zeros(len(samples), dtype = bool)
+  if (resets is not None):
+    init |= numpy.asarray(resets, dtype = bool)
+  init[:1] = True
+
+  mean_coeffs = numpy.where(init, 0.0, numpy.broadcast_to(1 - alphas, shape))
+  mean_rtt = linear_recurrence(mean_coeffs, numpy.where(init, samples, alphas * samples))
+  # rtt_var uses the mean_rtt from before each sample
+  prev_mean = numpy.empty(shape)
+  prev_mean[:, 1:] = mean_rtt[:, :-1]
+  prev_mean[:, :1] = samples[:1]
+  var_coeffs = numpy.where(init, 0.0, numpy.broadcast_to(1 - betas, shape))
+  rtt_var = linear_recurrence(var_coeffs, numpy.where(init, samples / 2, betas * numpy.abs(samples - prev_mean)))
+  timeout = mean_rtt + ks * rtt_var
+  timeout = numpy.where(init, timeout, numpy.clip(timeout, MIN_TIMEOUT, MAX_TIMEOUT))
+
+  if (scalar_settings):
+    return (mean_rtt[0], rtt_var[0], timeout[0])
+  return (mean_rtt, rtt_var, timeout)
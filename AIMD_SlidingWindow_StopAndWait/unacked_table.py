@@ -0,0 +1,99 @@
+import heapq
+from deadlines import deadline_signature
+
+class UnackedTable:
+  """
+  Bookkeeping for the unacked packets of a window-based sender. It replaces a plain
+  list of UnackedPacket objects, which had to be scanned on every tick and every ACK.
+
+  Data members of this class include:
+  packets: dict mapping a sequence number to its UnackedPacket
+  deadlines: min-heap of (timeout_tick, seq_num) retransmission deadlines
+
+  Removing an acked packet is O(1) and finding the packets that timed out is
+  O(expired). Heap entries are deleted lazily: an entry is stale once its packet
+  has been acked or its timer has been rearmed with a different timeout_tick.
+  """
+  def __init__(self):
+    self.packets   = dict()      # seq_num -> UnackedPacket
+    self.deadlines = []          # min-heap of (timeout_tick, seq_num)
+
+  def add(self, unacked_pkt):
+    """
+    Start tracking a newly sent packet and arm its retransmission timer
+    """
+    self.packets[unacked_pkt.seq_num] = unacked_pkt
+    heapq.heappush(self.deadlines, (unacked_pkt.timeout_tick, unacked_pkt.seq_num))
+
+  def rearm(self, unacked_pkt):
+    """
+    Re-arm the timer of a tracked packet after its timeout_tick has been changed
+    """
+    heapq.heappush(self.deadlines, (unacked_pkt.timeout_tick, unacked_pkt.seq_num))
+
+  def remove(self, seq_num):
+    """
+    Stop tracking seq_num, e.g., because it was acked. Returns the removed
+    UnackedPacket, or None if seq_num was not unacked.
+    """
+    return self.packets.pop(seq_num, None)
+
+  def get(self, seq_num):        # the UnackedPacket for seq_num, or None if it isn't unacked
+    return self.packets.get(seq_num)
+
+  def is_current(self, entry):   # is this heap entry still a live timer?
+    unacked_pkt = self.packets.get(entry[1])
+    return (unacked_pkt is not None and unacked_pkt.timeout_tick == entry[0])
+
+  def expired(self, tick):
+    """
+    Pop and return the unacked packets whose timeout_tick is <= tick,
+    in increasing sequence number order. The caller must rearm() each of them.
+    """
+    expired = dict()
+    while (len(self.deadlines) > 0 and self.deadlines[0][0] <= tick):
+      entry = heapq.heappop(self.deadlines)
+      if (self.is_current(entry)):
+        expired[entry[1]] = self.packets[entry[1]]
+    return [expired[seq_num] for seq_num in sorted(expired)]
+
+  def next_timeout_tick(self):
+    """
+    The earliest timeout_tick among the unacked packets, or None if there are none
+    """
+    while (len(self.deadlines) > 0 and not self.is_current(self.deadlines[0])):
+      heapq.heappop(self.deadlines)
+    if (len(self.deadlines) == 0):
+      return None
+    return self.deadlines[0][0]
+
+  def state_signature(self, tick, base):
+    """
+    The unacked packets in the order they were sent, with the ticks at which they
+    time out relative to tick and sequence numbers relative to base
+    """
+    return tuple((p.seq_num - base, p.num_retx, p.timeout_duration, deadline_signature(p.timeout_tick, tick))
+                 for p in self.packets.values())
+
+  def shift(self, ticks, seqs):
+    """
+    Move every unacked packet ticks into the future and seqs sequence numbers up.
+    The heap is rebuilt from the live timers only, which drops stale entries.
+    """
+    packets = dict()
+    for unacked_pkt in self.packets.values():
+      unacked_pkt.seq_num      += seqs
+      unacked_pkt.timeout_tick += ticks
+      packets[unacked_pkt.seq_num] = unacked_pkt
+    self.packets   = packets
+    self.deadlines = [(p.timeout_tick, p.seq_num) for p in packets.values()]
+    heapq.heapify(self.deadlines)
+
+  def __len__(self):
+    return len(self.packets)
+
+  def __contains__(self, seq_num):
+    return seq_num in self.packets
+
+  def __iter__(self):            # iterate over UnackedPackets in the order they were sent
+    return iter(self.packets.values())
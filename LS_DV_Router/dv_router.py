@@ -1,5 +1,8 @@
 # Base router class
 from router import *
+import logging
+
+log = logging.getLogger("sim.dv")
 
 # Class representing distance vector routers
 class DVRouter(Router):
@@ -16,6 +19,18 @@ class DVRouter(Router):
     # Hence, we don't need to explicitly store distances of infinity.
     self.dv = dict()
 
+    # Destinations whose distance changed since this router last advertised.
+    # Only these entries are advertised (a delta): a neighbor already has the
+    # others, and can't find anything better through them than it did before.
+    self.dirty = set()
+
+    # Number of distance vectors this router sent to its neighbors
+    self.num_messages = 0
+
+    # Number of DV entries this router sent, and received and looked at
+    self.entries_sent = 0
+    self.entries_processed = 0
+
   # Initialize DV at boot up
   def initialize_algorithm(self):
     # Distance vector to all neighbors of this router
@@ -27,51 +42,72 @@ class DVRouter(Router):
     self.dv[self.router_id] = 0
     self.fwd_table[self.router_id] = self.router_id
 
+    # Nothing has been advertised yet
+    self.dirty = set(self.dv)
+
   def tick(self, tick):
-    # If the DV changes, advertise it to every neighbor.
+    # If the DV changes, advertise the changed entries to every neighbor.
     # Reset the DV back to False at the end.
     if (self.dv_change):
+      dv_adv = {dst : self.dv[dst] for dst in self.dirty}
       for neighbor in self.neighbors:
-        self.send(neighbor, self.dv, self.router_id)
+        self.send(neighbor, dv_adv, self.router_id)
+      self.dirty.clear()
     self.dv_change = False
 
   def send(self, neighbor, dv_adv, adv_router):
+    self.num_messages += 1
+    self.entries_sent += len(dv_adv)
     neighbor.process_advertisement(dv_adv, adv_router)
 
+  # Converged once the DV has nothing new to advertise
+  def converged(self):
+    return not self.dv_change
+
   # The core logic of the algorithm goes in the process_advertisement method.
   # This method takes two arguments:
-  # (1) the distance vector advertisement that it is receiving (dv_adv)
+  # (1) the entries of adv_router's distance vector that changed since it last
+  # advertised it (dv_adv), all of them in its first advertisement
   # (2) and the router that is advertising this distance vector (adv_router)
+  # Only the entries in dv_adv are looked at, so an advertisement costs O(len(dv_adv)).
   def process_advertisement(self, dv_adv, adv_router):
-    # TODO: Implement this using the instructions below.
-    # (1) Iterate through all destinations in this router's distance vector (self.dv).
-    # If this destination is also in the dv_adv that you just received,
-    # check if you can find a better path to the destination through adv_router
-    # print('self.dv: ', self.dv)
-    # print('dv_adv: ', dv_adv)
-    # print('adv_router: ', adv_router)
-
-    for dst in self.dv:
-    # if k == dst:
-      # print('dv_adv[dst]', dv_adv[k])
-      # print('self.dv[dst]', self.dv[dst])
-      if dst in dv_adv:
-        if (dv_adv[dst] + self.links[adv_router]) < self.dv[dst]:
-          print('here')
-          self.dv.update({dst: dv_adv[dst] + self.links[adv_router]})
-          self.fwd_table.update({dst: adv_router})
-          self.dv_change = True
-
-    # (2) Iterate through all destinations in the just received distance vector (dv_adv),
-    # which are not in this router's current distance vector (self.dv)
-    # , i.e., this router's current distance to them is infinity.
-    # For such destinations, you should update the distance vector and next hop information
-    # to use adv_router because the current distance is infinity.
-    for k, v in dv_adv.items():
-      if k not in self.dv.keys():
-        self.dv.update({k: v + self.links[adv_router]})
-        self.fwd_table[k] = adv_router
+    self.entries_processed += len(dv_adv)
+    link_cost = self.links[adv_router]
+    for dst, adv_dist in dv_adv.items():
+      # Use adv_router if our current distance to dst is infinity (dst is not in self.dv)
+      # or if we can find a better path to dst through it
+      new_dist = adv_dist + link_cost
+      if (dst not in self.dv or new_dist < self.dv[dst]):
+        self.dv[dst] = new_dist
+        self.fwd_table[dst] = adv_router # current best choice of next hop to dst
+        self.dirty.add(dst)
         self.dv_change = True
-    print(self.router_id, 'fwd_table: ', self.fwd_table)
-    # (3) Make sure you update self.fwd_table[dst] to reflect the current best choice
-    # of next hop to destination dst. simulator.py uses this to check your implementation.
+    log.debug("%d fwd_table: %s", self.router_id, self.fwd_table)
+
+# Asynchronous DV engine: instead of ticking every router, keep a worklist of the
+# routers whose DV changed and only let those advertise. Each round, every router
+# on the worklist advertises its DV to its neighbors, and the neighbors whose DV
+# changed as a result go on the next round's worklist (once, however many
+# advertisements changed them). The work done is proportional to the number of
+# advertisements, not to routers x rounds. Returns the number of rounds it took
+# for the worklist to run empty, or None if it still wasn't after max_rounds.
+def run_worklist(routers, max_rounds):
+  worklist = [router for router in routers if router.dv_change]
+  rounds = 0
+  while (len(worklist) > 0):
+    if (rounds == max_rounds):
+      return None
+    next_worklist = []
+    queued = set()                # IDs of the routers in next_worklist
+    for router in worklist:
+      if (not router.dv_change):
+        continue                  # already advertised its latest DV this round
+      router.tick(rounds)
+      for neighbor in router.neighbors:
+        if (neighbor.dv_change and neighbor.router_id not in queued):
+          next_worklist.append(neighbor)
+          queued.add(neighbor.router_id)
+    log.debug("round %d: %d routers advertised, %d changed", rounds, len(worklist), len(next_worklist))
+    worklist = next_worklist
+    rounds += 1
+  return rounds
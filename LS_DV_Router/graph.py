@@ -4,43 +4,72 @@ import random
 # For numpy arrays
 import numpy
 
+# For sparse adjacency matrices
+import scipy.sparse
+
 # Simple class for graphs that we'll be using for assignment 3
-# We'll be using an adjacency list representation
+# We'll be using an adjacency list representation, and build NumPy edge arrays
+# and a sparse adjacency matrix from it when they are needed. Those are cached
+# until the graph changes, so callers can ask for them as often as they like.
 class Graph:
   def __init__(self):
     self.adj_list = dict()
+    self.edges = None             # cached (from, to, weight) arrays, None if stale
+    self.csr = None               # cached scipy.sparse.csr_matrix, None if stale
 
   # Add a new node to the graph without any edges
   def add_node(self, node_id):
     self.adj_list[node_id] = []
+    self.edges = None
+    self.csr = None
 
   # Add an edge to a graph; the nodes must already exist
   def add_edge(self, edge_from, edge_to, edge_weight):
     assert(edge_from in self.adj_list)
     assert(edge_to in self.adj_list)
     self.adj_list[edge_from].append((edge_to, edge_weight))
+    self.edges = None
+    self.csr = None
+
+  # Return NumPy arrays (edge_from, edge_to, edge_weight) with one element per
+  # directed edge, sorted by edge_from and then edge_to. If the same edge was
+  # added more than once, the last weight wins.
+  def edge_arrays(self):
+    if (self.edges is None):
+      weights = dict()
+      for i in self.adj_list:
+        for (j, weight) in self.adj_list[i]:
+          weights[(i, j)] = weight
+      pairs = sorted(weights)
+      edge_from   = numpy.array([i for (i, j) in pairs], dtype = numpy.int64)
+      edge_to     = numpy.array([j for (i, j) in pairs], dtype = numpy.int64)
+      edge_weight = numpy.array([weights[pair] for pair in pairs])
+      self.edges = (edge_from, edge_to, edge_weight)
+    return self.edges
+
+  # Return the adjacency matrix as a scipy.sparse.csr_matrix, with only the edges
+  # stored (required by scipy to compute connected components and shortest paths).
+  # matrix[i, j] is the weight of the edge from i to j, 0 if there is none.
+  def sparse_adj_mat(self):
+    if (self.csr is None):
+      num_nodes = len(self.adj_list)
+      (edge_from, edge_to, edge_weight) = self.edge_arrays()
+      self.csr = scipy.sparse.csr_matrix((edge_weight, (edge_from, edge_to)), shape = (num_nodes, num_nodes))
+    return self.csr
 
-  # Return adjacency matrix (required by scipy to compute shortest paths and in __str__ method)
+  # Return a dense adjacency matrix as a NumPy array. This needs num_nodes^2
+  # cells, so use sparse_adj_mat for anything but small graphs.
   def adj_mat(self):
-    num_nodes = len(self.adj_list)
-    matrix = [[0 for x in range(num_nodes)] for y in range(num_nodes)]
-    for i in range(0, num_nodes):
-      for edge in self.adj_list[i]:
-        j = edge[0]
-        weight = edge[1]
-        matrix[i][j] = weight
-    return numpy.array(matrix)
+    return self.sparse_adj_mat().toarray()
 
   # Use this to print out the graph for debugging
   def __str__(self):
     ret = ""
     ret += str(len(self.adj_list)) + "\n"
-    graph_adj_mat = self.adj_mat()
-    num_nodes = len(self.adj_list)
-    for i in range(0, num_nodes):
-      for j in range(i + 1, num_nodes):
-        if (graph_adj_mat[i][j] != 0):
-          ret += str(i) +  " " + str(j) + " " + str(graph_adj_mat[i][j]) + "\n"
+    (edge_from, edge_to, edge_weight) = self.edge_arrays()
+    for (i, j, weight) in zip(edge_from, edge_to, edge_weight):
+      if (i < j):
+        ret += str(i) +  " " + str(j) + " " + str(weight) + "\n"
     return ret
 
 # Generate a random undirected graph with a given probability of an edge between any 2 nodes
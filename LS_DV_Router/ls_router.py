@@ -1,9 +1,14 @@
 # Base router class
 from router import *
+import heapq
+from collections import deque
 import math
+import logging
 
-# This is long enough so that broadcasts complete even on large topologies
-BROADCAST_INTERVAL = 1000
+log = logging.getLogger("sim.ls")
+
+# Distance to routers we haven't found a path to yet
+INFINITY = math.inf
 
 # Class representing link state routers
 class LSRouter(Router):
@@ -11,109 +16,136 @@ class LSRouter(Router):
     # Common initialization routines
     Router.__init__(self, router_id)
 
-    # Is the broadcast complete? => Can we run Dijkstra's algorithm?
-    # For now, we'll use a simple heuristic for this:
-    # If BROADCAST_INTERVAL since the first link state advertisement (LSA) at time 0,
-    # we'll declare the broadcast complete
-    self.broadcast_complete = False
-
-    # Have you run Dijkstra's algorithm? This is to ensure you don't repeatedly run it.
-    self.routes_computed = False
-
     # LSA dictionary mapping from a router ID to the links for that router.
     # We'll initialize lsa_dict to this router's own links.
     self.lsa_dict = dict()
 
-    # For each LSA received from a distinct router,
-    # maintain if it has been broadcasted or not.
-    # This is to avoid repeated broadcasts of the same LSA
-    # We'll initialize self.broadcasted to reflect the fact that this router's own links
-    # have not yet been broadcasted as of time 0.
-    self.broadcasted = {self.router_id : False}
+    # Sequence number of the newest LSA we have from each router (the origin).
+    # An LSA is only stored and flooded further if it is newer than that,
+    # so each LSA crosses each link at most once in each direction.
+    self.lsa_seq = dict()
+
+    # Sequence number of this router's own LSA; bumped whenever its links change
+    self.seq_num = -1
+
+    # Queue of (origin, neighbor it came from) for LSAs that were accepted but not
+    # yet flooded to our neighbors; the neighbor is None for our own LSA
+    self.pending = deque()
 
-  # Initialize link state to this router's own links alone
+    # Have the LSAs changed since Dijkstra's algorithm last ran?
+    self.routes_dirty = True
+
+    # Number of LSAs this router sent to its neighbors
+    self.num_messages = 0
+
+  # Initialize link state to this router's own links alone, and flood them
   def initialize_algorithm(self):
-    self.lsa_dict = {self.router_id :self.links}
+    self.seq_num += 1
+    self.lsa_dict = {self.router_id : self.links}
+    self.lsa_seq  = {self.router_id : self.seq_num}
+    self.pending.append((self.router_id, None))
+    self.routes_dirty = True
 
   def tick(self, tick):
-    if (tick >= BROADCAST_INTERVAL and (self.routes_computed == False)):
-      # If broadcast phase is over, compute routes and return
-      self.broadcast_complete = True
+    if (len(self.pending) > 0):
+      # Flood every LSA accepted since the last tick to all neighbors,
+      # except the one it came from, who will flood it to theirs and so on
+      while (len(self.pending) > 0):
+        (adv_router, from_router) = self.pending.popleft()
+        for neighbor in self.neighbors:
+          if (neighbor.router_id != from_router):
+            self.send(neighbor, self.lsa_dict[adv_router], adv_router, self.lsa_seq[adv_router])
+    elif (self.routes_dirty):
+      # Nothing new arrived since the last tick: flooding has gone quiet here,
+      # so compute routes from what we have. Newer LSAs will mark them dirty again.
       self.dijkstras_algorithm()
-      self.routes_computed = True
-      return
-    elif (tick < BROADCAST_INTERVAL):
-      # TODO: Go through the LSAs received so far.
-      # broadcast each LSA to this router's neighbors if the LSA has not been broadcasted yet
-      for adv_router in self.lsa_dict:
-        lsa        = self.lsa_dict[adv_router]
-        if (adv_router in self.broadcasted and self.broadcasted[adv_router]):
-          continue # move on to the next router
-        else:
-          # broadcast to all your neighbors, who will broadcast it to theirs and so on
-          for neighbor in self.neighbors:
-            self.send(neighbor, lsa, adv_router)
-            self.broadcasted[adv_router] = True
-    else:
-      return
+      self.routes_dirty = False
 
   # Note that adv_router is the router that generated this advertisment,
   # which may be different from "self",
   # the router that is broadcasting this advertisement by sending it to a neighbor of self.
-  def send(self, neighbor, ls_adv, adv_router):
-    neighbor.lsa_dict[adv_router] = ls_adv
-    # It's OK to reinitialize this even if adv_router even if adv_router is in lsa_dict
+  def send(self, neighbor, ls_adv, adv_router, seq_num):
+    self.num_messages += 1
+    neighbor.receive_lsa(ls_adv, adv_router, seq_num, self.router_id)
+
+  # Accept an LSA from neighbor from_router if it is newer than what we have from
+  # adv_router, and queue it to be flooded on our next tick
+  def receive_lsa(self, ls_adv, adv_router, seq_num, from_router):
+    if (adv_router in self.lsa_seq and self.lsa_seq[adv_router] >= seq_num):
+      return                      # duplicate or old LSA, already flooded
+    self.lsa_dict[adv_router] = ls_adv
+    self.lsa_seq[adv_router]  = seq_num
+    self.pending.append((adv_router, from_router))
+    self.routes_dirty = True
+    log.debug("%d accepted LSA %d from %d via %d", self.router_id, seq_num, adv_router, from_router)
+
+  # Converged once there is nothing left to flood and routes are up to date
+  def converged(self):
+    return len(self.pending) == 0 and not self.routes_dirty
 
   def dijkstras_algorithm(self):
-    # TODO:
-    # (1) Implement Dijkstra's single-source shortest path algorithm
-    # to find the shortest paths from this router to all other destinations in the network.
-    # Feel free to use a different shortest path algo. if you're more comfortable with it.
-    # (2) Remember to populate self.fwd_table with the next hop for every destination
-    # because simulator.py uses this to check your LS implementation.
-    # (3) If it helps, you can use the helper function next_hop below to compute paths once you
-    # have populated the prev dictionary which maps a destination to the penultimate hop
-    # on the shortest path to this destination from this router.
-    nodes = []
+    # Dijkstra's single-source shortest path algorithm from this router to all
+    # other destinations in the network, using a binary heap as the priority queue.
+    # Instead of decreasing a router's key in the heap, we push it again with its
+    # new distance and skip stale entries when they are popped (lazy deletion),
+    # so this is O(E log V).
+    # It then populates self.fwd_table with the next hop for every destination
+    # because simulator.py uses this to check the LS implementation.
     distance = {}
     prev = {}
     # initialization
     distance[self.router_id] = 0  # Distance to the same router is 0
     prev[self.router_id] = -1     # There is no previous for a router connecting to itself
-    prioq = [self.router_id]      # Poor man's priority queue for Dijkstra's algorithm 
     for router in self.lsa_dict:
       if (router != self.router_id):
         distance[router] = INFINITY
         prev[router] = -1
-        prioq += [router]         # Add all routers that we have seen in the LSAs to prioq
+    prioq = [(0, self.router_id)] # heap of (distance when pushed, router)
 
     # the main priority queue based routine
     while (len(prioq) > 0):
-      # Find and remove router with minimum distance. This is a very inefficient way to do it.
-      min_router = min(prioq, key = lambda element: distance[element])
-      prioq = [x for x in prioq if x != min_router]
+      # Pop the router with minimum distance, skipping entries made stale by a later push
+      (min_dist, min_router) = heapq.heappop(prioq)
+      if (min_dist > distance[min_router]):
+        continue
+      if (min_router not in self.lsa_dict):
+        continue                  # no LSA from it (yet), so its links are unknown
 
       # For each neighbor of min_router
-      for neighbor in self.lsa_dict[min_router]:
+      for neighbor, cost in self.lsa_dict[min_router].items():
         # Find alternate distance through min_router
-        alt_dist = distance[min_router] + self.lsa_dict[min_router][neighbor]
+        alt_dist = min_dist + cost
 
         # Change path if min_router has a better path
-        if (alt_dist < distance[neighbor]):
+        if (alt_dist < distance.get(neighbor, INFINITY)):
           distance[neighbor] = alt_dist
           prev[neighbor] = min_router
+          heapq.heappush(prioq, (alt_dist, neighbor))
 
-    # Use the distance and prev dictionaries to compute next hops for fwd_table
-    self.fwd_table[self.router_id] = self.router_id # initialize fwd_table for this router
-    for router in self.lsa_dict: # For all other routers
+    # Use the prev dictionary to compute next hops for fwd_table
+    self.fwd_table = {self.router_id : self.router_id} # initialize fwd_table for this router
+    for router in prev: # For all other routers
       if (router != self.router_id):
-        self.fwd_table[router] = self.next_hop(router, prev)    
-    # print(self.router_id, self.fwd_table)
+        self.next_hop(router, prev)
+    log.debug("%d fwd_table: %s", self.router_id, self.fwd_table)
 
   def next_hop(self, dst, prev):
+    # Walk back from dst along prev until we reach a router whose next hop is
+    # already in fwd_table, or one that is directly connected to this router,
+    # then give every router on the way that same next hop. Each router is
+    # walked over once across all calls, so filling fwd_table is O(V) overall,
+    # and long paths don't run into Python's recursion limit.
     assert (prev[dst] != -1)  # Can't find next_hop if dst is disconnected from self.router_id
     assert (self.router_id != dst)  # Nor if dst and self.router_id are the same
-    if (prev[dst] == self.router_id):
-      return dst  # base case, src and dst are directly connected
-    else:
-      return self.next_hop(prev[dst], prev)
+    path = []
+    router = dst
+    while (router not in self.fwd_table):
+      path.append(router)
+      if (prev[router] == self.router_id):
+        break                 # src and router are directly connected
+      router = prev[router]
+      assert (router != -1)
+    hop = self.fwd_table[router] if router in self.fwd_table else router
+    for router in path:
+      self.fwd_table[router] = hop
+    return hop
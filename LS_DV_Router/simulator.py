@@ -11,24 +11,35 @@ import argparse
 import random
 import scipy.sparse
 import sys
+import os
+
+# simlog lives at the top of the repository
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import simlog
 
 # import assignment-3-specific files
 from graph import *
 from dv_router import *
 from ls_router import *
 
-# compute shortest path from predecessor array (preds)
+# compute shortest path from src's row of the predecessor array (preds): the routers
+# strictly between src and dst. Walks preds back from dst to src and reverses the list,
+# iteratively so that long paths don't run into Python's recursion limit.
 def compute_shortest_path(src, dst, preds):
   # -9999 is a special value that scipy uses if no path exists between src and dst
   # This could happen if either src == dst,
   # or if src is disconnected from destination. We'll assert both false.
-  assert(preds[src][dst] != -9999)
+  assert(preds[dst] != -9999)
   assert(src != dst)
 
-  if (preds[src][dst] == src):
-    return [] # base case, src and dst are directly connected
-  else:
-    return compute_shortest_path(src, preds[src][dst], preds) + [preds[src][dst]]
+  path = []
+  router = preds[dst]
+  while (router != src):      # src and dst are directly connected once we reach src
+    assert(router != -9999)
+    path.append(router)
+    router = preds[router]
+  path.reverse()
+  return path
 
 # check routing algorithm is either DV or LS
 def check_algo_type(algo_type):
@@ -43,9 +54,18 @@ def check_link_prob(link_prob_str):
     raise argparse.ArgumentTypeError("Link probability must be between 0 and 1.")
   return link_prob
 
+# check the number of routers to check routes from is positive
+def check_num_sources(num_sources_str):
+  num_sources = int(num_sources_str)
+  if (num_sources < 1):
+    raise argparse.ArgumentTypeError("Number of routers to check must be at least 1.")
+  return num_sources
+
 # Usage for command line arguments
 parser = argparse.ArgumentParser(description='Assignment 3 simulator.')
 parser.add_argument('rt_algo', type=check_algo_type, help='Type of routing algorithm. Must be either DV or LS')
+parser.add_argument('--check_sources', dest='check_sources', type=check_num_sources, help='Check the routes from this many randomly chosen routers against the offline shortest paths, default all routers')
+simlog.add_arguments(parser)
 
 subparsers=parser.add_subparsers(dest='input_type', help='Type of graph input. Must be either file_input or rand_input', metavar='input_type')
 subparsers.required=True
@@ -65,6 +85,7 @@ file_input_parser.add_argument('--graph_file', dest='graph_file', type=str, help
 # Actually carry out parsing
 args=parser.parse_args()
 print(args)
+simlog.configure(args.log, args.trace_buffer)
 
 
 # Create test_graph
@@ -79,7 +100,8 @@ else:
   raise argparse.ArgumentTypeError("Must specify one of rand_input or file_input")
 
 # Ensure that it is connected
-num_components = scipy.sparse.csgraph.connected_components(test_graph.adj_mat(), return_labels = False)
+adj_mat = test_graph.sparse_adj_mat() # cached by test_graph, only stores the edges
+num_components = scipy.sparse.csgraph.connected_components(adj_mat, return_labels = False)
 if (num_components != 1):
   raise argparse.ArgumentTypeError("Input graph is disconnected.\nFor randomly generated graphs, use a different seed or increase the link probability.\nFor graphs generated from files, check the graph file.")
 
@@ -94,76 +116,105 @@ for i in range(0, num_nodes):
   else:
     assert(False)
 
-# Populate router's neighbors and links based on the random graph
+# Populate router's neighbors and links based on the random graph,
+# from row i of the adjacency matrix (its entries are i's neighbors and link costs)
 for i in range(0, num_nodes):
+  row = slice(adj_mat.indptr[i], adj_mat.indptr[i + 1])
+  neighbor_ids = adj_mat.indices[row].tolist()
+
   # Add neighbors first
-  adj_list = test_graph.adj_list[i]
-  neighbors_as_refs = [routers[elem[0]]for elem in adj_list]
+  neighbors_as_refs = [routers[j] for j in neighbor_ids]
   routers[i].add_neighbors(neighbors_as_refs)
 
   # Add links next
-  links = dict()
-  for elem in adj_list:
-    links[elem[0]] = elem[1]
+  links = dict(zip(neighbor_ids, adj_mat.data[row].tolist()))
   routers[i].add_links(links)
 
   # Init either DV/LS algorithm
   routers[i].initialize_algorithm()
 
-# Now simulate
-for tick in range(0, NUM_TICKS):
-  for i in range(0, num_nodes):
-    routers[i].tick(tick)
-
-# Offline computation of the graph's shortest paths
-(distances, preds) = scipy.sparse.csgraph.shortest_path(test_graph.adj_mat(), return_predecessors=True)
+# Now simulate, until every router has converged or NUM_TICKS have passed
+if (args.rt_algo == "DV"):
+  # Only routers whose DV changed do any work, so just run those (see run_worklist)
+  rounds = run_worklist(routers, NUM_TICKS)
+  num_messages = sum(router.num_messages for router in routers)
+  if (rounds is None):
+    print("Not converged after " + str(NUM_TICKS) + " rounds, " + str(num_messages) + " messages sent")
+  else:
+    print("Converged after " + str(rounds) + " rounds and " + str(num_messages) + " messages")
+  # DV advertisements only carry the entries that changed (see DVRouter.tick)
+  entries_sent = sum(router.entries_sent for router in routers)
+  entries_processed = sum(router.entries_processed for router in routers)
+  print("DV entries sent: %d, processed: %d (%.1f per message, %.1f per round)" %
+        (entries_sent, entries_processed, entries_processed / max(num_messages, 1),
+         entries_processed / max(rounds or NUM_TICKS, 1)))
+else:
+  converged_tick = None
+  for tick in range(0, NUM_TICKS):
+    for i in range(0, num_nodes):
+      routers[i].tick(tick)
+    if (all(router.converged() for router in routers)):
+      converged_tick = tick
+      break
+  num_messages = sum(router.num_messages for router in routers)
+  if (converged_tick is None):
+    print("Not converged after " + str(NUM_TICKS) + " ticks, " + str(num_messages) + " messages sent")
+  else:
+    print("Converged at tick " + str(converged_tick) + " after " + str(num_messages) + " messages")
 
-# Walk through preds to determine shortest paths
-offline_sp = [[0 for x in range(num_nodes)] for y in range(num_nodes)]
-for i in range(0, num_nodes):
-  for j in range(0, num_nodes):
-    if (i != j):
-      offline_sp[i][j] = [i] + compute_shortest_path(i, j, preds) + [j]
+# Routers whose routes to every other router are checked; a sample is drawn from
+# its own generator, so it doesn't change the graph or the routing algorithm
+if (args.check_sources is None or args.check_sources >= num_nodes):
+  check_sources = range(0, num_nodes)
+else:
+  check_sources = sorted(random.Random(0).sample(range(0, num_nodes), args.check_sources))
+  print("Checking the routes from " + str(len(check_sources)) + " of " + str(num_nodes) + " routers")
 
-# Routing algorithm (DV/LS)'s shortest paths
-rt_algo_sp = [[0 for x in range(num_nodes)] for y in range(num_nodes)]
-for i in range(0, num_nodes):
-  for j in range(0, num_nodes):
-    if (i != j):
-      if (j not in routers[i].fwd_table):
-        raise UnimplementedCode(str(j) + " isn't in router " + str(i) + "'s fwd table")
-      next_hop = routers[i].fwd_table[j]
-      router_path = []
-      while (next_hop != j):
-        router_path += [next_hop]
-        if (j not in routers[next_hop].fwd_table):
-          raise UnimplementedCode(str(j) + " isn't in router " + str(next_hop) + "'s fwd table")
-        next_hop = routers[next_hop].fwd_table[j]
-      rt_algo_sp[i][j] = [i] + router_path + [j]
-
-# Compare the two:
+# Check the routes one source router at a time against scipy's shortest paths from
+# that router, so only one row of distances and predecessors is held at a time
 error = False
-for i in range(0, num_nodes):
+for i in check_sources:
+  (distances, preds) = scipy.sparse.csgraph.shortest_path(adj_mat, return_predecessors=True, indices=i)
+  preds = preds.tolist()
   for j in range(0, num_nodes):
-    if (i != j):
-      if (offline_sp[i][j] != rt_algo_sp[i][j]):
-        print ("\nNOTE: Routing algorithm computed shortest path from ", i, " to ", j, " as ",\
-               rt_algo_sp[i][j], "\nOffline algorithm computed shortest path from ", i, " to ", j, " as ", \
-               offline_sp[i][j])
-        rt_distance = 0
-        adj_mat = test_graph.adj_mat()
-        for index in range(1, len(rt_algo_sp[i][j])):
-          rt_distance += adj_mat[rt_algo_sp[i][j][index - 1]][rt_algo_sp[i][j][index]]
-        print ("Distance computed by offline algorithm = ", distances[i][j],
-               "\nDistance computed by routing algorithm = ", rt_distance)
-        if (rt_distance == distances[i][j]):
-          print ("Distances computed by both algorithms are the same even though paths are different")
-        else:
-          print ("ERROR!!!: Distances differ")
-          error = True
+    if (i == j):
+      continue
+    # Offline shortest path, walking through preds
+    offline_sp = [i] + compute_shortest_path(i, j, preds) + [j]
+
+    # Routing algorithm (DV/LS)'s shortest path
+    if (j not in routers[i].fwd_table):
+      raise UnimplementedCode(str(j) + " isn't in router " + str(i) + "'s fwd table")
+    next_hop = routers[i].fwd_table[j]
+    router_path = []
+    while (next_hop != j):
+      router_path += [next_hop]
+      if (j not in routers[next_hop].fwd_table):
+        raise UnimplementedCode(str(j) + " isn't in router " + str(next_hop) + "'s fwd table")
+      next_hop = routers[next_hop].fwd_table[j]
+    rt_algo_sp = [i] + router_path + [j]
+
+    # Compare the two:
+    if (offline_sp != rt_algo_sp):
+      print ("\nNOTE: Routing algorithm computed shortest path from ", i, " to ", j, " as ",\
+             rt_algo_sp, "\nOffline algorithm computed shortest path from ", i, " to ", j, " as ", \
+             offline_sp)
+      rt_distance = 0
+      for index in range(1, len(rt_algo_sp)):
+        rt_distance += adj_mat[rt_algo_sp[index - 1], rt_algo_sp[index]]
+      print ("Distance computed by offline algorithm = ", distances[j],
+             "\nDistance computed by routing algorithm = ", rt_distance)
+      if (rt_distance == distances[j]):
+        print ("Distances computed by both algorithms are the same even though paths are different")
+      else:
+        print ("ERROR!!!: Distances differ")
+        error = True
 
 if (error == False):
-  print ("\nSUCCESS: Routing and offline algorithm agree on shortest paths between all node pairs")
+  if (len(check_sources) == num_nodes):
+    print ("\nSUCCESS: Routing and offline algorithm agree on shortest paths between all node pairs")
+  else:
+    print ("\nSUCCESS: Routing and offline algorithm agree on shortest paths from all checked routers")
   sys.exit(0)
 else:
   print ("\nERROR: There was at least one path on which routing and offline algorithm did not agree")
@@ -0,0 +1,135 @@
+"""
+Offline plotting of saved simulator output.
+
+The simulators don't plot anything themselves, so that they can run on machines
+without a display and without loading matplotlib. Instead they save their time
+series, and this script turns them into image files:
+
+  a metrics directory written by simulator.py --metrics DIR (see metrics.py)
+  a CSV file with a header row, as written by fifo.py, pim.py, ewma.py and plotter.py
+
+By default every column other than the x column gets its own subplot, so that
+series with different units (e.g., window and RTT) stay readable. --overlay draws
+them all on one set of axes instead. In metrics directories recorded with
+--metrics_mode minmax, the <series>_min and <series>_max columns are drawn as one
+shaded band per series.
+
+python3 plot_metrics.py AIMD_SlidingWindow_StopAndWait/aimd_metrics --output aimd.png
+python3 plot_metrics.py PIM_FIFO/pim.csv --ylabel "Average delay since tick 0 (in ticks)"
+"""
+
+import argparse
+import csv
+import os
+import sys
+import numpy
+
+# metrics.py lives with the transport simulator
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "AIMD_SlidingWindow_StopAndWait"))
+
+def read_csv(path):
+  """
+  Load a CSV file with a header row as a dict mapping column names to NumPy arrays
+  """
+  with open(path, newline = "") as fh:
+    reader = csv.reader(fh)
+    header = next(reader)
+    rows = [[float(value) for value in row] for row in reader if len(row) > 0]
+  values = numpy.array(rows, dtype = float).reshape(len(rows), len(header))
+  return dict((header[i], values[:, i]) for i in range(len(header)))
+
+def read_series(path):
+  """
+  Load a metrics directory or a CSV file, returning (columns, names in file order)
+  """
+  if (os.path.isdir(path)):
+    from metrics import read_metrics
+    import json
+    columns = read_metrics(path)
+    with open(os.path.join(path, "meta.json")) as fh:
+      names = json.load(fh)["columns"]
+  else:
+    columns = read_csv(path)
+    with open(path, newline = "") as fh:
+      names = next(csv.reader(fh))
+  return (columns, names)
+
+def group_series(names, x):
+  """
+  Group column names into series to plot: a series is either one column, or a
+  (<series>_min, <series>_max) pair of columns
+  """
+  groups = []
+  for name in names:
+    if (name == x):
+      continue
+    if (name.endswith("_min") and name[:-4] + "_max" in names):
+      groups.append((name[:-4], [name, name[:-4] + "_max"]))
+    elif (name.endswith("_max") and name[:-4] + "_min" in names):
+      continue
+    else:
+      groups.append((name, [name]))
+  return groups
+
+def plot(columns, groups, x, output, overlay = False, title = None, ylabel = None):
+  import matplotlib
+  matplotlib.use("Agg")
+  import matplotlib.pyplot as plt
+
+  num_axes = 1 if overlay else len(groups)
+  fig, axes = plt.subplots(num_axes, 1, sharex = True, squeeze = False,
+                           figsize = (8, 2.5 * num_axes if num_axes > 1 else 4.5))
+  axes = axes[:, 0]
+  for i in range(len(groups)):
+    label, names = groups[i]
+    ax = axes[0] if overlay else axes[i]
+    if (len(names) == 2):
+      # Outline the band too, it has no area where min. and max. are equal
+      line, = ax.plot(columns[x], columns[names[1]], linewidth = 0.5, drawstyle = "steps-post", label = label)
+      ax.plot(columns[x], columns[names[0]], linewidth = 0.5, drawstyle = "steps-post", color = line.get_color())
+      ax.fill_between(columns[x], columns[names[0]], columns[names[1]], alpha = 0.3, step = "post", color = line.get_color())
+    else:
+      ax.plot(columns[x], columns[names[0]], label = label)
+    if (not overlay):
+      ax.set_ylabel(ylabel if ylabel is not None else label)
+  if (overlay):
+    if (ylabel is not None):
+      axes[0].set_ylabel(ylabel)
+    if (len(groups) > 1):
+      axes[0].legend()
+  axes[-1].set_xlabel(x)
+  if (title is not None):
+    axes[0].set_title(title)
+  fig.tight_layout()
+  fig.savefig(output)
+  plt.close(fig)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Plot a metrics directory or CSV file saved by one of the simulators to an image file')
+  parser.add_argument('input', type=str, help='metrics directory or CSV file')
+  parser.add_argument('--output', dest='output', type=str, help='image file to write, with any extension matplotlib supports, default the input path with a .png extension')
+  parser.add_argument('--x', dest='x', type=str, help='column for the x axis, default the first column')
+  parser.add_argument('--y', dest='y', type=str, help='comma-separated series to plot, default all other columns')
+  parser.add_argument('--overlay', dest='overlay', action='store_true', help='draw all series on one set of axes')
+  parser.add_argument('--title', dest='title', type=str, help='plot title')
+  parser.add_argument('--ylabel', dest='ylabel', type=str, help='y axis label, default the series name')
+  args = parser.parse_args()
+
+  columns, names = read_series(args.input)
+  x = args.x if args.x is not None else names[0]
+  if (x not in columns):
+    raise argparse.ArgumentTypeError("No column " + x + " in " + args.input + ", columns are " + ",".join(names))
+  groups = group_series(names, x)
+  if (args.y is not None):
+    wanted = args.y.split(",")
+    for name in wanted:
+      if (name not in [label for (label, group_names) in groups]):
+        raise argparse.ArgumentTypeError("No series " + name + " in " + args.input + ", series are " +
+                                         ",".join(label for (label, group_names) in groups))
+    groups = [group for group in groups if group[0] in wanted]
+
+  output = args.output
+  if (output is None):
+    output = os.path.splitext(args.input.rstrip(os.sep))[0] + ".png"
+  plot(columns, groups, x, output, overlay = args.overlay, title = args.title, ylabel = args.ylabel)
+  print("Wrote " + output)
@@ -0,0 +1,135 @@
+"""
+Event logging shared by the three simulators in this repository.
+
+Simulator code never calls print() for per-packet or per-advertisement events.
+It logs them through the standard logging module on one logger per component:
+
+  sim.host     transport hosts (StopAndWait, SlidingWindow, Aimd)
+  sim.link     link queue and random loss
+  sim.timeout  retransmission timeout calculator
+  sim.engine   transport simulation engine, e.g., steady-state fast-forward
+  sim.dv       distance vector routers
+  sim.ls       link state routers
+  sim.switch   PIM and FIFO input-queued switches
+
+Events are logged at DEBUG, drops and other unusual events at INFO. Nothing is
+logged by default, so a disabled event costs one level check. Entry points call
+configure() to turn logging on, either from their command line or from the
+SIM_LOG and SIM_TRACE_BUFFER environment variables:
+
+  SIM_LOG=link=INFO,host=DEBUG   per-component levels, printed to stderr
+  SIM_LOG=DEBUG                  one level for every component
+  SIM_TRACE_BUFFER=10000         keep the last 10000 events in memory and dump them
+                                 to stderr if the simulator dies on an exception,
+                                 e.g., a failed assertion
+"""
+
+import logging
+import os
+import sys
+from collections import deque
+
+ROOT_LOGGER = "sim"
+LOG_FORMAT  = "%(name)s %(levelname)s %(message)s"
+
+class RingBufferHandler(logging.Handler):
+  """
+  Logging handler that keeps the most recent capacity records in memory
+  """
+  def __init__(self, capacity):
+    logging.Handler.__init__(self, logging.DEBUG)
+    self.records = deque(maxlen = capacity) # oldest records fall off the front
+    self.setFormatter(logging.Formatter(LOG_FORMAT))
+
+  def emit(self, record):
+    self.records.append(record)
+
+  def dump(self, stream = None):
+    """
+    Write the buffered records to stream (stderr by default), oldest first
+    """
+    if (stream is None):
+      stream = sys.stderr
+    stream.write("---- last " + str(len(self.records)) + " simulator events ----\n")
+    for record in self.records:
+      stream.write(self.format(record) + "\n")
+    stream.flush()
+
+# The ring buffer installed by configure(), if any
+ring_buffer = None
+
+def parse_levels(spec):
+  """
+  Parse "component=LEVEL,component=LEVEL" (or a bare "LEVEL" for all components)
+  into a dict mapping logger names to numeric levels
+  """
+  levels = dict()
+  for item in spec.split(","):
+    item = item.strip()
+    if (item == ""):
+      continue
+    if ("=" in item):
+      component, level_name = item.split("=", 1)
+      name = ROOT_LOGGER + "." + component.strip()
+    else:
+      level_name = item
+      name = ROOT_LOGGER
+    level = logging.getLevelName(level_name.strip().upper())
+    if (not isinstance(level, int)):
+      raise ValueError("Unknown log level " + level_name + " in " + spec)
+    levels[name] = level
+  return levels
+
+def configure(levels = None, ring_size = None, stream = None):
+  """
+  Turn on simulator logging.
+
+  levels: "component=LEVEL,..." string as described above; defaults to $SIM_LOG.
+          Enabled events are printed to stream (stderr by default).
+  ring_size: number of recent events to keep in memory and dump on an uncaught
+             exception; defaults to $SIM_TRACE_BUFFER. If levels is not given,
+             every event goes to the ring buffer and nothing is printed.
+  """
+  global ring_buffer
+  if (levels is None):
+    levels = os.environ.get("SIM_LOG", "")
+  if (ring_size is None):
+    ring_size = int(os.environ.get("SIM_TRACE_BUFFER", "0"))
+
+  root = logging.getLogger(ROOT_LOGGER)
+  root.propagate = False         # keep simulator events out of the root logger
+  level_map = parse_levels(levels)
+  if (len(level_map) > 0):
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.addHandler(handler)
+    if (ROOT_LOGGER not in level_map):
+      root.setLevel(logging.WARNING)
+    for name in level_map:
+      logging.getLogger(name).setLevel(level_map[name])
+
+  if (ring_size > 0):
+    ring_buffer = RingBufferHandler(ring_size)
+    root.addHandler(ring_buffer)
+    if (len(level_map) == 0):
+      # Record everything, print nothing
+      root.setLevel(logging.DEBUG)
+    install_excepthook()
+
+def install_excepthook():
+  """
+  Dump the ring buffer before the traceback of any uncaught exception
+  """
+  previous_hook = sys.excepthook
+  def hook(exc_type, exc_value, exc_traceback):
+    if (ring_buffer is not None):
+      ring_buffer.dump()
+    previous_hook(exc_type, exc_value, exc_traceback)
+  sys.excepthook = hook
+
+def add_arguments(parser):
+  """
+  Add --log and --trace_buffer options to an argparse parser
+  """
+  parser.add_argument('--log', dest='log', type=str, help='per-component log levels, e.g., link=INFO,host=DEBUG, or a single level for all components; default $SIM_LOG, i.e., off', default=None)
+  parser.add_argument('--trace_buffer', dest='trace_buffer', type=int, help='number of recent events to keep in memory and dump if the simulator dies on an exception, default $SIM_TRACE_BUFFER or 0', default=None)